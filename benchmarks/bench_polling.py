@@ -0,0 +1,152 @@
+"""Benchmarks for the pyswegon polling path.
+
+Runs pyswegon.Swegon against the bundled simulator and reports registers per
+second, poll latency percentiles and allocations per poll. Compare the
+output between commits to catch regressions before they reach a site.
+
+    python benchmarks/bench_polling.py --polls 200 --latency 0.02 --jitter 0.005
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# pyswegon is importable on its own, without Home Assistant
+sys.path.append(str(Path(__file__).resolve().parent.parent / "custom_components" / "swegon"))
+
+from pyswegon.registers import plan_reads  # noqa: E402
+from pyswegon.simulator import SwegonSimulator  # noqa: E402
+from pyswegon.swegon import Swegon  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def bench_poll(args):
+    """Full refreshes of every polled register, for one or more units."""
+    simulator = SwegonSimulator(
+        args.model, port=0, slave_ids=tuple(range(1, args.units + 1)),
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        max_connections=args.max_connections,
+    )
+    await simulator.start()
+    units = [
+        Swegon(args.model, simulator.host, simulator.port, slave_id, args.pipeline_window)
+        for slave_id in range(1, args.units + 1)
+    ]
+    registers = [
+        register for register in units[0].image.registers.values()
+        if register.group != "Config"
+    ]
+
+    async def poll(unit):
+        started = time.perf_counter()
+        try:
+            await unit.readRegisters(registers)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    # Warm up, connects and fills the image
+    await asyncio.gather(*(poll(unit) for unit in units))
+
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(args.polls):
+        for result in await asyncio.gather(*(poll(unit) for unit in units)):
+            if result is None:
+                failures += 1
+            else:
+                latencies.append(result)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await poll(units[0])
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+
+    requests = units[0].hub.requests
+    for unit in units:
+        await unit.close()
+    await simulator.stop()
+
+    polls = len(latencies)
+    return {
+        "units": args.units,
+        "polls": polls,
+        "failures": failures,
+        "requests_per_poll": len(plan_reads(registers)),
+        "requests": requests,
+        "registers_per_sec": round(polls * len(registers) / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3) if polls else None,
+        "latency_p90_ms": round(percentile(latencies, 90) * 1000, 3) if polls else None,
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3) if polls else None,
+        "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 3) if polls else None,
+        "allocations_per_poll": allocations,
+        "allocated_bytes_per_poll": allocated,
+    }
+
+
+def bench_decode(args):
+    """Storing and decoding a full register image, no network involved."""
+    unit = Swegon(args.model, "127.0.0.1", 0)
+    registers = list(unit.image.registers.values())
+    blocks = plan_reads(registers)
+    words = {block: [(block.address + i) & 0x7FFF for i in range(block.count)] for block in blocks}
+
+    rounds = args.decode_rounds
+    started = time.perf_counter()
+    for i in range(rounds):
+        for block in blocks:
+            words[block][0] = i & 0xFF
+            unit._storeBlock(block, words[block])
+        for register in registers:
+            unit.getValue(register.group, register.key)
+    elapsed = time.perf_counter() - started
+    return {
+        "rounds": rounds,
+        "us_per_round": round(elapsed / rounds * 1e6, 2),
+        "registers_per_sec": round(rounds * len(registers) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="CASA R4")
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--units", type=int, default=1, help="units behind the simulated gateway")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int, default=None)
+    parser.add_argument("--pipeline-window", type=int, default=1)
+    parser.add_argument("--decode-rounds", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        "poll": asyncio.run(bench_poll(args)),
+        "decode": bench_decode(args),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, values in results.items():
+        print(name)
+        for key, value in values.items():
+            print("  {:<26} {}".format(key, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 """Support for Swegon CASA over Modbus TCP/IP."""
 import logging
 import async_timeout
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import ATTR_DEVICE_ID
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.device_registry import DeviceEntry
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers import entity_registry as er
@@ -18,13 +22,35 @@ from .const import (
     CONF_PORT,
     CONF_SLAVE_ID,
     CONF_SCAN_INTERVAL,
-    CONF_SCAN_INTERVAL_FAST,
-    DEVICE_CASA_R4
+    CONF_PIPELINE_WINDOW,
+    CONF_STALE_AGE,
+    DEFAULT_PIPELINE_WINDOW,
+    DEFAULT_STALE_AGE,
+    DEVICE_CASA_R4,
+    SERVICE_SNAPSHOT,
 )
 from .coordinator import SwegonCoordinator
+from .pyswegon.registers import HOLDING, INPUT
 
 _LOGGER = logging.getLogger(__name__)
 
+ATTR_INPUT_RANGE = "input_range"
+ATTR_HOLDING_RANGE = "holding_range"
+
+def _ordered(value):
+    if value[0] >= value[1]:
+        raise vol.Invalid("start must be below end")
+    return value
+
+
+_RANGE = vol.All(vol.ExactSequence([cv.positive_int, cv.positive_int]), _ordered)
+
+SNAPSHOT_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_INPUT_RANGE): _RANGE,
+    vol.Optional(ATTR_HOLDING_RANGE): _RANGE,
+})
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Set up platform from a ConfigEntry."""
     _LOGGER.debug("Setting up configuration for Swegon CASA!")
@@ -37,7 +63,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     port = entry.data[CONF_PORT]
     slave_id = entry.data[CONF_SLAVE_ID]
     scan_interval = entry.data[CONF_SCAN_INTERVAL]
-    scan_interval_fast = entry.data[CONF_SCAN_INTERVAL_FAST]
+    pipeline_window = entry.data.get(CONF_PIPELINE_WINDOW, DEFAULT_PIPELINE_WINDOW)
+    stale_age = entry.data.get(CONF_STALE_AGE, DEFAULT_STALE_AGE)
 
     # Create device
     # Each config entry will have only one device, so we use the entry_id as a
@@ -51,16 +78,43 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     )
 
     # Set up coordinator
-    coordinator = SwegonCoordinator(hass, dev, device_model, ip, port, slave_id,scan_interval, scan_interval_fast)
+    coordinator = SwegonCoordinator(hass, dev, device_model, ip, port, slave_id,scan_interval, pipeline_window, stale_age)
     hass.data[DOMAIN][entry.entry_id] = coordinator
-    
+    await coordinator.async_load_cache()
+    await coordinator.async_probe()
+
+    # One refresh for all platforms, entities are added with their values.
+    # If the unit doesn't answer, setup is retried later.
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except ConfigEntryNotReady:
+        hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_close()
+        raise
+
     # Forward the setup to the platforms.
-    hass.async_create_task(
-        hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-    )
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     # Set up options listener
     entry.async_on_unload(entry.add_update_listener(update_listener))
+
+    if not hass.services.has_service(DOMAIN, SERVICE_SNAPSHOT):
+        async def async_snapshot(call: ServiceCall) -> None:
+            """Dump the registers of the given units, or of all of them."""
+            device_ids = call.data.get(ATTR_DEVICE_ID)
+            ranges = None
+            if ATTR_INPUT_RANGE in call.data or ATTR_HOLDING_RANGE in call.data:
+                ranges = {}
+                if ATTR_INPUT_RANGE in call.data:
+                    ranges[INPUT] = tuple(call.data[ATTR_INPUT_RANGE])
+                if ATTR_HOLDING_RANGE in call.data:
+                    ranges[HOLDING] = tuple(call.data[ATTR_HOLDING_RANGE])
+            for coordinator in list(hass.data[DOMAIN].values()):
+                if device_ids and coordinator.device_id not in device_ids:
+                    continue
+                await coordinator.async_snapshot(ranges)
+
+        hass.services.async_register(DOMAIN, SERVICE_SNAPSHOT, async_snapshot, schema=SNAPSHOT_SCHEMA)
     
     return True
 
@@ -76,7 +130,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_close()
+        if not hass.data[DOMAIN]:
+            hass.services.async_remove(DOMAIN, SERVICE_SNAPSHOT)
 
     return unload_ok
 
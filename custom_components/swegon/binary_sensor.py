@@ -30,7 +30,7 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     for swegonentity in ENTITIES:
         ha_entities.append(SwegonBinarySensorEntity(coordinator, swegonentity))
 
-    async_add_devices(ha_entities, True)
+    async_add_devices(ha_entities)
 
 
 class SwegonBinarySensorEntity(SwegonBaseEntity, BinarySensorEntity):
@@ -42,17 +42,14 @@ class SwegonBinarySensorEntity(SwegonBaseEntity, BinarySensorEntity):
         """Sensor Entity properties"""
         self._attr_device_class = swegonentity.data_type.deviceClass
 
+        """Attributes list every alarm, so listen to the whole group"""
+        self.coordinator_context = (self._group, None)
+
     @property
     def extra_state_attributes(self):
         """Return entity specific state attributes."""
-        attrs = {}
-        alarms = self.coordinator._swegonDevice.Datapoints["Alarms"]
-        for (dataPointName, data) in alarms.items():
-            if data.Value:
-                newAttr = {dataPointName:"ALARM"}
-                attrs.update(newAttr)
-        return attrs
-        
+        return self.coordinator.alarm_attributes
+
     @property
     def is_on(self):
         """Return the state of the switch."""
@@ -12,10 +12,12 @@ _LOGGER = logging.getLogger(__name__)
 DATA_TYPE = namedtuple('DataType', ['deviceClass', 'category', 'icon'])
 DATA_TYPES = {}
 DATA_TYPES["Reset_Alarms"] = DATA_TYPE(None, None, "mdi:bell-cancel")
+DATA_TYPES["Config_Refresh"] = DATA_TYPE(None, EntityCategory.CONFIG, "mdi:refresh")
 
 SwegonEntity = namedtuple('SwegonEntity', ['group', 'key', 'entityName', 'data_type'])
 ENTITIES = [
     SwegonEntity("Config", "Reset_Alarms", "Reset Alarms", DATA_TYPES["Reset_Alarms"]),
+    SwegonEntity(None, "Config_Refresh", "Refresh Config Values", DATA_TYPES["Config_Refresh"]),
 ]
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
@@ -30,7 +32,7 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     for swegonentity in ENTITIES:
         ha_entities.append(SwegonButtonEntity(coordinator, swegonentity))
 
-    async_add_devices(ha_entities, True)
+    async_add_devices(ha_entities)
 
 class SwegonButtonEntity(SwegonBaseEntity, ButtonEntity):
     """Representation of a Sensor."""
@@ -44,7 +46,10 @@ class SwegonButtonEntity(SwegonBaseEntity, ButtonEntity):
     async def async_press(self) -> None:
         """ Write value to device """
         try:
-            await self.coordinator.write_value(self._group, self._key, 1)
+            if self._key == "Config_Refresh":
+                await self.coordinator.refresh_config()
+            else:
+                await self.coordinator.write_value(self._group, self._key, 1)
         except Exception as err:
             _LOGGER.debug("Error writing command: %s %s", self._group, self._key)         
         finally:
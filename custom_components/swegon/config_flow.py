@@ -7,6 +7,7 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import config_validation as cv
 
@@ -19,15 +20,81 @@ from .const import (
     CONF_SLAVE_ID,
     CONF_SCAN_INTERVAL,
     CONF_SCAN_INTERVAL_FAST,
+    CONF_PIPELINE_WINDOW,
+    CONF_STALE_AGE,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_SCAN_INTERVAL_FAST,
-    DEVICE_CASA_R5H,
+    DEFAULT_PIPELINE_WINDOW,
+    DEFAULT_STALE_AGE,
+    DEVICE_CASA_R4,
+    DEVICE_CASA_R15,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Requests in flight per gateway, more than a few rarely pays off
+MAX_PIPELINE_WINDOW = 8
+
 # -----------------------------------------------------------------------------
 # Defaults used when creating a new config entry
 # -----------------------------------------------------------------------------
 DEFAULT_DEVICE_DATA: dict[str, Any] = {
-    CONF_NAME:
+    CONF_NAME: "Swegon CASA",
+    CONF_DEVICE_MODEL: DEVICE_CASA_R4,
+    CONF_IP: "",
+    CONF_PORT: 502,
+    CONF_SLAVE_ID: 1,
+    CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_FAST: DEFAULT_SCAN_INTERVAL_FAST,
+    CONF_PIPELINE_WINDOW: DEFAULT_PIPELINE_WINDOW,
+    CONF_STALE_AGE: DEFAULT_STALE_AGE,
+}
+
+
+def _device_schema(data: dict[str, Any]) -> vol.Schema:
+    """Schema of the device settings, defaulting to the values in data."""
+    data = {**DEFAULT_DEVICE_DATA, **data}
+    return vol.Schema({
+        vol.Required(CONF_NAME, default=data[CONF_NAME]): cv.string,
+        vol.Required(CONF_DEVICE_MODEL, default=data[CONF_DEVICE_MODEL]): vol.In([DEVICE_CASA_R4, DEVICE_CASA_R15]),
+        vol.Required(CONF_IP, default=data[CONF_IP]): cv.string,
+        vol.Required(CONF_PORT, default=data[CONF_PORT]): cv.port,
+        vol.Required(CONF_SLAVE_ID, default=data[CONF_SLAVE_ID]): vol.All(vol.Coerce(int), vol.Range(min=1, max=247)),
+        vol.Required(CONF_SCAN_INTERVAL, default=data[CONF_SCAN_INTERVAL]): cv.positive_int,
+        vol.Required(CONF_SCAN_INTERVAL_FAST, default=data[CONF_SCAN_INTERVAL_FAST]): cv.positive_int,
+        vol.Required(CONF_PIPELINE_WINDOW, default=data[CONF_PIPELINE_WINDOW]): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PIPELINE_WINDOW)),
+        vol.Required(CONF_STALE_AGE, default=data[CONF_STALE_AGE]): cv.positive_int,
+    })
+
+
+class SwegonConfigFlow(ConfigFlow, domain=DOMAIN):
+    """Set up one Swegon unit per config entry."""
+
+    VERSION = 1
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        return SwegonOptionsFlow(config_entry)
+
+    async def async_step_user(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        if user_input is not None:
+            self._async_abort_entries_match({CONF_IP: user_input[CONF_IP], CONF_SLAVE_ID: user_input[CONF_SLAVE_ID]})
+            return self.async_create_entry(title=user_input[CONF_NAME], data=user_input)
+        return self.async_show_form(step_id="user", data_schema=_device_schema({}))
+
+
+class SwegonOptionsFlow(OptionsFlow):
+    """Change the settings of a unit, the entry is reloaded with them."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        if user_input is not None:
+            # Settings live in the entry data, the update listener reloads the entry
+            self.hass.config_entries.async_update_entry(
+                self._entry, title=user_input[CONF_NAME], data={**self._entry.data, **user_input})
+            return self.async_create_entry(title="", data={})
+        return self.async_show_form(step_id="init", data_schema=_device_schema(dict(self._entry.data)))
@@ -12,10 +12,39 @@ CONF_PORT: str = "port"
 CONF_SLAVE_ID: str = "slave_id"
 CONF_SCAN_INTERVAL: str = "scan_interval"
 CONF_SCAN_INTERVAL_FAST: str = "scan_interval_fast"
+CONF_PIPELINE_WINDOW: str = "pipeline_window"
+CONF_STALE_AGE: str = "stale_age"
 
 # Defaults
 DEFAULT_SCAN_INTERVAL: int = 300  # Seconds
 DEFAULT_SCAN_INTERVAL_FAST: int = 5  # Seconds
+DEFAULT_PIPELINE_WINDOW: int = 1  # Outstanding requests, 1 disables pipelining
+DEFAULT_STALE_AGE: int = 300  # Seconds past the poll interval before a value is unavailable
+
+# Every planned read gets this long, queueing included, a slow one doesn't fail the refresh
+REQUEST_DEADLINE: int = 5  # Seconds
+
+# Cache of device info and last known register values
+STORAGE_VERSION: int = 1
+CACHE_SAVE_DELAY: int = 300  # Seconds
+
+# Config parameters are read as one block and served from cache for this long
+CONFIG_CACHE_TTL: int = 600  # Seconds
+
+# Register snapshots are written below the config directory
+SERVICE_SNAPSHOT: str = "snapshot"
+SNAPSHOT_DIR: str = "swegon_snapshots"
+
+# Discovered register maps, shared by units of the same model and firmware
+DISCOVERY_DATA: str = "swegon_discovery"
+DISCOVERY_RETRY_INTERVAL: int = 600  # Seconds, after a failed probe or discovery
+
+# Fired when an alarm is raised or cleared
+EVENT_ALARM: str = "swegon_alarm"
+
+# Rolling min/max/mean/trend of measurements, kept in memory
+STATISTICS_WINDOW: int = 900  # Seconds
+STATISTICS_GROUPS = ("Sensors", "Sensors2", "UnitStatuses")
 
 # Device types - Name and device file
 DEVICE_CASA_R4 = "CASA R4"
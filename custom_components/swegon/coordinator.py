@@ -1,49 +1,102 @@
+import asyncio
 import async_timeout
 import datetime as dt
 import logging
+import os
+import time
 
+from homeassistant.core import callback
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util, slugify
 
-from .const import DOMAIN
+from .const import DOMAIN, CACHE_SAVE_DELAY, CONFIG_CACHE_TTL, DEFAULT_STALE_AGE, DISCOVERY_DATA, DISCOVERY_RETRY_INTERVAL, EVENT_ALARM, REQUEST_DEADLINE, SNAPSHOT_DIR, STATISTICS_GROUPS, STATISTICS_WINDOW, STORAGE_VERSION
+from .pyswegon.derived import DERIVED
+from .pyswegon.discovery import DISCOVERY_VERSION, discover, invalid_addresses, map_key
+from .pyswegon.hub import PRIORITY_INTERACTIVE
+from .pyswegon.scheduler import PollScheduler
+from .pyswegon.snapshot import dump, take_snapshot
+from .pyswegon.stats import RollingStats
 from .pyswegon.swegon import Swegon
 
 _LOGGER = logging.getLogger(__name__)
 
 class SwegonCoordinator(DataUpdateCoordinator):
-    _fast_poll_enabled = False
-    _fast_poll_count = 0
     _normal_poll_interval = 60
-    _fast_poll_interval = 10
     
-    def __init__(self, hass, device, device_module:str, ip, port, slave_id, scan_interval, scan_interval_fast):
+    def __init__(self, hass, device, device_module:str, ip, port, slave_id, scan_interval, pipeline_window=1, stale_age=DEFAULT_STALE_AGE):
         """Initialize coordinator parent"""
+        self._device = device
+        self._swegonDevice = Swegon(device_module, ip, port, slave_id, pipeline_window)
+
+        # Every datapoint is polled at its own interval, the coordinator
+        # ticks at the shortest one and only reads what is due.
+        self._scheduler = PollScheduler(self._swegonDevice.Registers.values(), scan_interval)
+        self._normal_poll_interval = self._scheduler.tick or scan_interval
+
+        # Polled datapoints are unavailable once they haven't been read for
+        # their poll interval plus stale_age. Their quality is tracked to
+        # wake the entities when it changes.
+        self._max_age = {
+            key: self._scheduler.interval(register) + stale_age
+            for key, register in self._swegonDevice.Registers.items()
+            if self._scheduler.interval(register)
+        }
+        for derived in DERIVED:
+            if all(key in self._max_age for key in derived.inputs):
+                self._max_age[(derived.group, derived.key)] = max(self._max_age[key] for key in derived.inputs)
+        self._stale = set()
+        self._quality = {}
+
         super().__init__(
             hass,
             _LOGGER,
             # Name of the data. For logging purposes.
             name="Swegon CASA: " + device.name,
             # Polling interval. Will only be polled if there are subscribers.
-            update_interval=dt.timedelta(seconds=scan_interval),
+            update_interval=dt.timedelta(seconds=self._normal_poll_interval),
         )
 
-        self._normal_poll_interval = scan_interval
-        self._fast_poll_interval = scan_interval_fast
-
-        self._device = device
-        self._swegonDevice = Swegon(device_module, ip, port, slave_id)
-
-        # Initialize states
-        self._measurements = None
-        self._setpoints = None
-        self._timestamp = dt.datetime(2024, 1, 1)
-
-        # Storage for config selection
+        # Storage for config selection. Options are indexed once, values
+        # are read as one block and served from cache for CONFIG_CACHE_TTL.
         self.config_selection = 0
+        self._config_options = dict(enumerate(self._swegonDevice.image.groups.get("Config", [])))
+        self._config_read_at = None
 
         # Callback to entities
         self._update_callbacks = {}
 
+        # Datapoints changed by the last refresh, used to only wake the
+        # entities whose datapoints actually changed.
+        self._changed_keys = set()
+        self._changed_groups = set()
+        self._diagnostics = {}
+        self._notify_all = True
+        self._last_notified_success = None
+
+        # Device info and register values survive restarts, so entities
+        # have values before the unit has been polled.
+        self._store = Store(hass, STORAGE_VERSION, "{}.{}".format(DOMAIN, device.id))
+        self._cache_save_pending = False
+        self._device_info_read = False
+
+        # Rolling statistics of measurements, one sample per poll
+        self._statistics = {}
+
+        # Attributes of the alarm sensor, rebuilt when the alarms change
+        self._alarm_attributes = {}
+
+        # Register map discovered for the model and firmware of the unit.
+        # A failed probe or discovery is tried again after a while.
+        self.discovered_map = None
+        self._retry_at = None
+
+        # Discovery runs in the background, it is cancelled on unload so it
+        # doesn't keep reading through a released connection.
+        self._background_tasks = set()
+        self._discovery_task = None
+
     @property
     def device_id(self):
         return self._device.id
@@ -56,45 +109,166 @@ class SwegonCoordinator(DataUpdateCoordinator):
     def identifiers(self):
         return self._device.identifiers
 
-    def setFastPollMode(self):
-        _LOGGER.debug("Enabling fast poll mode")
-        self._fast_poll_enabled = True
-        self._fast_poll_count = 0
-        self.update_interval = dt.timedelta(seconds=self._fast_poll_interval)
-        self._schedule_refresh()
-
-    def setNormalPollMode(self):
-        _LOGGER.debug("Enabling normal poll mode")
-        self._fast_poll_enabled = False
-        self.update_interval = dt.timedelta(seconds=self._normal_poll_interval)
-
-
     async def _async_update_data(self):
         _LOGGER.debug("Coordinator updating data!!")
 
-        """ Counter for fast polling """
-        if self._fast_poll_enabled:
-            self._fast_poll_count += 1
-            if self._fast_poll_count > 5:
-                self.setNormalPollMode()
-
         """ Fetch data """
         try:
-            async with async_timeout.timeout(20):
-                if self._swegonDevice.Datapoints["Device_Info"]["FW_Maj"].Value == 0:
-                    await self._swegonDevice.readDeviceInfo()
+            # Once per start, cached device info is only revalidated
+            if not self._device_info_read:
+                async with async_timeout.timeout(REQUEST_DEADLINE):
+                    self._device_info_read = await self._swegonDevice.readDeviceInfo()
+                if self._device_info_read:
                     await self._async_update_deviceInfo()
-                if (dt.datetime.now() - self._timestamp) > dt.timedelta(hours=3):
-                    await self._swegonDevice.readSetpoints() 
-                    self._timestamp = dt.datetime.now()
-                await self._swegonDevice.readAlarms()
-                await self._swegonDevice.readSensors()
-                await self._swegonDevice.readCommands()
-                await self._swegonDevice.readUnitStatuses()
-                
+                    self._async_start_background(self.async_apply_discovery())
+        except Exception as err:
+            _LOGGER.debug("Failed when reading device info: %s", str(err))
+
+        if self._retry_at is not None and time.monotonic() >= self._retry_at:
+            self._retry_at = None
+            self._async_start_background(self._async_retry_discovery())
+
+        try:
+            # Only what has reached its interval, due registers share
+            # requests. Every request has its own deadline, registers of the
+            # ones that fail are read again on the next tick.
+            due = self._scheduler.due()
+            if due:
+                updated, failed = await self._swegonDevice.pollRegisters(due, REQUEST_DEADLINE)
+                self._scheduler.mark_polled(updated)
+                self._record_statistics(updated)
+                if failed:
+                    _LOGGER.debug("%s of %s registers of %s could not be read", len(failed), len(due), self.devicename)
         except Exception as err:
             _LOGGER.debug("Failed when fetching data: %s", str(err))
 
+        self._detect_changes()
+        if any(group != "Diagnostics" for group in self._changed_groups):
+            self._schedule_cache_save()
+
+        # Entities keep their values until they are stale, the refresh only
+        # fails once nothing is left that is fresh enough to show. That
+        # includes a first refresh where nothing could be read, so setup is
+        # retried instead of creating entities without values.
+        if not self._has_fresh_values():
+            raise UpdateFailed("{} is not responding".format(self.devicename))
+
+    def _has_fresh_values(self):
+        """True while some polled datapoint is not stale yet."""
+        return len(self._stale) < len(self._max_age)
+
+    def is_stale(self, group, key):
+        """True once a polled datapoint hasn't been read for its poll
+        interval plus the staleness age. Others are never stale."""
+        return (group, key) in self._stale
+
+    def datapoint_attributes(self, group, key):
+        """When a register backed datapoint was last read, and its quality."""
+        updated = self._swegonDevice.getUpdated(group, key)
+        if updated is None:
+            return {}
+        return {
+            "last_read": dt_util.utc_from_timestamp(updated).isoformat(),
+            "quality": self._swegonDevice.getQuality(group, key),
+        }
+
+    def _update_freshness(self):
+        """Recompute staleness and quality, returns the datapoints where either changed."""
+        now = time.time()
+        stale = set()
+        quality = {}
+        for key, max_age in self._max_age.items():
+            updated = self._swegonDevice.getUpdated(*key)
+            if updated is None or now - updated > max_age:
+                stale.add(key)
+            quality[key] = self._swegonDevice.getQuality(*key)
+        changed = stale ^ self._stale
+        changed.update(key for key, value in quality.items() if self._quality.get(key) != value)
+        self._stale = stale
+        self._quality = quality
+        return changed
+
+    def _record_statistics(self, registers):
+        now = time.monotonic()
+        for register in registers:
+            if register.group not in STATISTICS_GROUPS:
+                continue
+            value = self._swegonDevice.getValue(register.group, register.key)
+            if value is None:
+                continue
+            key = (register.group, register.key)
+            stats = self._statistics.get(key)
+            if stats is None:
+                stats = self._statistics[key] = RollingStats(
+                    STATISTICS_WINDOW, STATISTICS_WINDOW // self._normal_poll_interval + 1)
+            stats.add(now, value)
+
+    @property
+    def alarm_attributes(self):
+        """Active alarms as {key: "ALARM"}, the same dict until they change."""
+        return self._alarm_attributes
+
+    def get_statistics(self, group, key):
+        """Rolling min, max, mean and trend (per hour) of a measurement, None if not tracked."""
+        stats = self._statistics.get((group, key))
+        return None if stats is None else stats.as_dict()
+
+    def _detect_changes(self):
+        """Collect the datapoints whose raw registers changed."""
+        self._changed_keys = self._swegonDevice.popChanges()
+        self._changed_keys |= self._update_freshness()
+        # Requests of this unit, connections are shared by the gateway
+        diagnostics = self._swegonDevice.metrics.summary()
+        diagnostics["Reconnects"] = self._swegonDevice.hub.metrics.reconnects
+        for key, value in diagnostics.items():
+            if self._diagnostics.get(key) != value:
+                self._changed_keys.add(("Diagnostics", key))
+        self._diagnostics = diagnostics
+        self._changed_groups = {group for (group, key) in self._changed_keys}
+
+        if "Alarms" in self._changed_groups:
+            self._alarm_attributes = {key: "ALARM" for key in self._swegonDevice.getActiveAlarms()}
+        for key, active in self._swegonDevice.popAlarmTransitions():
+            _LOGGER.debug("%s alarm %s %s", self.devicename, key, "raised" if active else "cleared")
+            self.hass.bus.async_fire(EVENT_ALARM, {
+                "device_id": self.device_id,
+                "name": self.devicename,
+                "alarm": key,
+                "active": active,
+            })
+
+    @callback
+    def async_add_key_listener(self, group, key, update_callback):
+        """Listen for changes of one datapoint.
+
+        A key of None listens to every datapoint in the group, a group of
+        None is woken on every refresh. Returns a function that removes
+        the listener.
+        """
+        return self.async_add_listener(update_callback, (group, key))
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Only wake the listeners whose datapoints changed."""
+        if self.last_update_success != self._last_notified_success:
+            self._notify_all = True
+        self._last_notified_success = self.last_update_success
+
+        for update_callback, context in list(self._listeners.values()):
+            if self._notify_all or self._is_changed(context):
+                update_callback()
+        self._notify_all = False
+
+    def _is_changed(self, context):
+        if not isinstance(context, tuple):
+            return True
+        group, key = context
+        if group is None:
+            return True
+        if key is None:
+            return group in self._changed_groups
+        return context in self._changed_keys
+
     async def _async_update_deviceInfo(self) -> None:
         device_registry = dr.async_get(self.hass)
         device_registry.async_update_device(
@@ -106,6 +280,179 @@ class SwegonCoordinator(DataUpdateCoordinator):
         )
         _LOGGER.debug("Updated device data for: %s", self.devicename) 
 
+    async def async_load_cache(self) -> None:
+        """Populate the datapoints from the cache of the last run.
+
+        Restored registers are polled again when their interval would have
+        run out had there been no restart, so a restart does not read every
+        register of the unit at once.
+        """
+        cache = await self._store.async_load()
+        if not cache:
+            return
+        restored = self._swegonDevice.restore(cache)
+        if self._swegonDevice.getValue("Device_Info", "FW_Maj"):
+            await self.async_apply_discovery(scan=False)
+        self._discard_unsupported()
+        age = max(0.0, time.time() - cache.get("saved", 0))
+        self._scheduler.mark_polled(restored, time.monotonic() - age)
+        self._detect_changes()
+        _LOGGER.debug("Restored %s datapoints of %s from cache, %.0fs old", len(restored), self.devicename, age)
+
+    async def async_probe(self) -> None:
+        """Find out once which optional registers the unit has.
+
+        The result is cached with the other device data. If the unit can't
+        be reached or is busy every entity is created, and the probe runs
+        again after DISCOVERY_RETRY_INTERVAL.
+        """
+        if self._swegonDevice.probed:
+            return
+        try:
+            async with async_timeout.timeout(20):
+                await self._swegonDevice.probeOptional()
+        except Exception as err:
+            _LOGGER.debug("Probing %s failed: %s", self.devicename, str(err))
+            self._retry_at = time.monotonic() + DISCOVERY_RETRY_INTERVAL
+            return
+        self._discard_unsupported()
+        self._schedule_cache_save()
+
+    async def async_apply_discovery(self, scan=True) -> None:
+        """Use the register map discovered for the model and firmware.
+
+        Without one the unit is scanned in the background, once for every
+        unit with the same model and firmware. Maps stored by another
+        version of the discovery are dropped and scanned again.
+        """
+        data = self.hass.data.get(DISCOVERY_DATA)
+        if data is None:
+            store = Store(self.hass, STORAGE_VERSION, DISCOVERY_DATA)
+            maps = await store.async_load() or {}
+            data = self.hass.data.setdefault(DISCOVERY_DATA, {"store": store, "maps": maps, "pending": {}})
+
+        firmware = self._swegonDevice.getFW()
+        key = map_key(self._swegonDevice.device_module, firmware)
+        discovered = data["maps"].get(key)
+        if discovered is not None and discovered.get("version") != DISCOVERY_VERSION:
+            _LOGGER.debug("Dropping the register map of %s from an older discovery", key)
+            del data["maps"][key]
+            data["store"].async_delay_save(lambda: data["maps"], CACHE_SAVE_DELAY)
+            discovered = None
+        if discovered is None:
+            if not scan:
+                return
+            task = data["pending"].get(key)
+            if task is None:
+                _LOGGER.debug("Discovering the register map of %s through %s", key, self.devicename)
+                task = data["pending"][key] = self.hass.async_create_task(discover(self._swegonDevice, firmware))
+                self._discovery_task = task
+            try:
+                # Shielded, units waiting for the map of another one don't
+                # cancel its scan when they are unloaded
+                discovered = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                _LOGGER.debug("Discovering the register map of %s was cancelled, the unit was unloaded", key)
+                self._retry_at = time.monotonic() + DISCOVERY_RETRY_INTERVAL
+                return
+            except Exception as err:
+                _LOGGER.debug("Discovering the register map of %s failed: %s", key, str(err))
+                self._retry_at = time.monotonic() + DISCOVERY_RETRY_INTERVAL
+                return
+            finally:
+                if data["pending"].get(key) is task:
+                    del data["pending"][key]
+            data["maps"][key] = discovered
+            data["store"].async_delay_save(lambda: data["maps"], CACHE_SAVE_DELAY)
+
+        self.discovered_map = discovered
+        missing = self._swegonDevice.applyDiscovery(invalid_addresses(discovered))
+        if missing:
+            _LOGGER.info("%s does not answer %s, leaving them out", self.devicename, sorted(missing))
+        self._discard_unsupported()
+
+    async def _async_retry_discovery(self) -> None:
+        await self.async_probe()
+        if self._device_info_read:
+            await self.async_apply_discovery()
+
+    def _discard_unsupported(self):
+        self._scheduler.discard(
+            register for key, register in self._swegonDevice.Registers.items()
+            if key in self._swegonDevice.unsupported
+        )
+        for key in [key for key in self._max_age if not self.supports(*key)]:
+            del self._max_age[key]
+            self._stale.discard(key)
+            self._quality.pop(key, None)
+
+    def supports(self, group, key):
+        return self._swegonDevice.supports(group, key)
+
+    def _schedule_cache_save(self):
+        """Save the cache within CACHE_SAVE_DELAY.
+
+        async_delay_save restarts its timer on every call, and values change
+        on almost every poll. A pending save is not pushed back, or it would
+        never happen.
+        """
+        if not self._cache_save_pending:
+            self._cache_save_pending = True
+            self._store.async_delay_save(self._cache_data, CACHE_SAVE_DELAY)
+
+    def _cache_data(self):
+        self._cache_save_pending = False
+        data = self._swegonDevice.snapshot()
+        data["saved"] = time.time()
+        return data
+
+    def _async_start_background(self, coro):
+        task = self.hass.async_create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def async_close(self) -> None:
+        """Stop discovery, save the cache and release the shared Modbus connection."""
+        tasks = [task for task in (*self._background_tasks, self._discovery_task) if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._store.async_save(self._cache_data())
+        await self._swegonDevice.close()
+
+    @property
+    def hub_stats(self):
+        """Queue depth and wait times of the shared Modbus connection."""
+        return self._swegonDevice.hub.stats()
+
+    @property
+    def transport_metrics(self):
+        """Request counts, latency histograms and bytes of this unit, and of
+        every unit on the gateway."""
+        return {
+            "unit": self._swegonDevice.metrics.as_dict(),
+            "gateway": self._swegonDevice.hub.metrics.as_dict(),
+        }
+
+    async def async_snapshot(self, ranges=None):
+        """Dump every register in ranges, {table: (start, end)}, to a JSON
+        file in the config directory. Returns the path of the file."""
+        snapshot = await take_snapshot(self._swegonDevice, ranges)
+        directory = self.hass.config.path(SNAPSHOT_DIR)
+        path = os.path.join(directory, "{}_{}.json".format(
+            slugify(self.devicename), dt_util.now().strftime("%Y%m%d_%H%M%S")))
+
+        def write():
+            os.makedirs(directory, exist_ok=True)
+            dump(snapshot, path)
+
+        await self.hass.async_add_executor_job(write)
+        _LOGGER.info("Register snapshot of %s written to %s, %s requests in %ss",
+                     self.devicename, path, snapshot["requests"], snapshot["duration"])
+        return path
+
     def registerOnUpdateCallback(self, entity, callbackfunc):
         self._update_callbacks.update({entity: callbackfunc})
 
@@ -114,24 +461,49 @@ class SwegonCoordinator(DataUpdateCoordinator):
 
         self.config_selection = value
         try:
-            await self._swegonDevice.readValue("Config", key)
+            await self.async_refresh_config()
         finally:
             await self._update_callbacks["Config_Value"](key)
 
+    async def async_refresh_config(self, force=False):
+        """Read all config parameters at once, unless the cached ones are recent."""
+        if not force and self._config_read_at is not None and time.monotonic() - self._config_read_at < CONFIG_CACHE_TTL:
+            return
+        await self._swegonDevice.readGroups(["Config"], PRIORITY_INTERACTIVE)
+        self._config_read_at = time.monotonic()
+        self._async_publish_changes()
+
+    async def refresh_config(self):
+        """Re-read the config parameters and show the selected one."""
+        try:
+            await self.async_refresh_config(force=True)
+        finally:
+            key = self._config_options.get(self.config_selection)
+            if key is not None and "Config_Value" in self._update_callbacks:
+                await self._update_callbacks["Config_Value"](key)
+
     def get_config_options(self):
-        configs = self._swegonDevice.Datapoints["Config"]
-        options = {}
-        for i, config in enumerate(configs):
-            options.update({i:config})
-        return options
+        return self._config_options
 
     def get_value(self, group, key):
-        if group in self._swegonDevice.Datapoints:
-            if key in self._swegonDevice.Datapoints[group]:
-                return self._swegonDevice.Datapoints[group][key].Value
-        return None
+        if group == "Diagnostics":
+            return self._diagnostics.get(key)
+        return self._swegonDevice.getValue(group, key)
 
     async def write_value(self, group, key, value) -> bool:
+        """Write a value, the entity is updated optimistically and again
+        once the write has been confirmed by a read-back."""
         _LOGGER.debug("Write_Data: %s - %s - %s", group, key, value)
-        await self._swegonDevice.writeValue(group, key, value)
-        self.setFastPollMode()
+        committed = self._swegonDevice.queueWrite(group, key, value)
+        self._async_publish_changes()
+        try:
+            await committed
+        finally:
+            self._async_publish_changes()
+
+    @callback
+    def _async_publish_changes(self):
+        """Wake listeners of datapoints changed outside a refresh."""
+        self._detect_changes()
+        if self._changed_keys:
+            self.async_update_listeners()
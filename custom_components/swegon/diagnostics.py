@@ -0,0 +1,20 @@
+"""Diagnostics support for Swegon."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_IP
+
+TO_REDACT = {CONF_IP}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "connection": coordinator.hub_stats,
+        "transport": coordinator.transport_metrics,
+        "discovered_map": coordinator.discovered_map,
+    }
@@ -9,11 +9,19 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class SwegonBaseEntity(CoordinatorEntity):
-    """Swego base entity class."""
+    """Swego base entity class.
+
+    The coordinator context is the (group, key) of the datapoint, so the
+    entity is only woken when that datapoint changes, goes stale or
+    changes quality.
+    """
+
+    # Changes with every state written, not worth keeping in the recorder
+    _unrecorded_attributes = frozenset({"last_read"})
 
     def __init__(self, coordinator, swegonentity):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, (swegonentity.group, swegonentity.key))
 
         """Generic Entity properties"""
         self._attr_entity_category = swegonentity.data_type.category
@@ -29,7 +37,12 @@ class SwegonBaseEntity(CoordinatorEntity):
         self._group = swegonentity.group
         self._key = swegonentity.key
 
+    @property
+    def available(self):
+        """Unavailable once the datapoint has not been read for too long."""
+        return super().available and not self.coordinator.is_stale(self._group, self._key)
+
     @property
     def extra_state_attributes(self):
-        """Return the state attributes."""
-        return self._extra_state_attributes        
+        """Return the state attributes, with when the value was read and its quality."""
+        return {**self._extra_state_attributes, **self.coordinator.datapoint_attributes(self._group, self._key)}
@@ -40,7 +40,7 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     for swegonentity in ENTITIES:
         ha_entities.append(SwegonNumberEntity(coordinator, swegonentity))
 
-    async_add_devices(ha_entities, True)
+    async_add_devices(ha_entities)
 
 class SwegonNumberEntity(SwegonBaseEntity, NumberEntity):
     """Representation of a Number."""
@@ -0,0 +1,72 @@
+# Circuit breaker with exponential backoff
+#
+# Keeps an unreachable unit or gateway from being hammered. After a number of
+# failures in a row the breaker opens and calls fail fast, until a single
+# probe is let through after the backoff delay. The delay doubles for every
+# failed probe, with jitter so units behind one gateway don't retry in step.
+
+import random
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_BASE_DELAY = 5  # Seconds
+DEFAULT_MAX_DELAY = 300  # Seconds
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of a request while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY, jitter=0.2,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0  # Times opened since the last success
+        self.retry_at = 0.0
+
+    @property
+    def available(self):
+        return self.state == CLOSED
+
+    def delay(self):
+        """Backoff before the next probe, grows with every failed probe."""
+        delay = min(self.max_delay, self.base_delay * 2 ** max(0, self.opened - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def allow(self, now=None):
+        """True if a call may go through, half opens the breaker once the
+        backoff has passed so exactly one probe is let through."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and (now if now is not None else time.monotonic()) >= self.retry_at:
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+
+    def record_failure(self, now=None):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened += 1
+            self.retry_at = (now if now is not None else time.monotonic()) + self.delay()
+
+    def check(self, name, now=None):
+        if not self.allow(now):
+            wait = max(0.0, self.retry_at - (now if now is not None else time.monotonic()))
+            raise CircuitOpenError("{} unavailable, retrying in {:.0f}s".format(name, wait))
@@ -0,0 +1,84 @@
+# Derived datapoints
+#
+# Values computed from other datapoints, e.g. the heat recovery efficiency.
+# Each one declares its inputs and is only recomputed when one of them has
+# changed, not on every refresh.
+
+from collections import namedtuple
+
+# Air density (kg/m3) times specific heat (J/kgK), per m3/h of flow in W/K
+AIR_HEAT_CAPACITY = 1.2 * 1005 / 3600
+
+# function: called with the input values in order, only when none is None
+Derived = namedtuple('Derived', ['group', 'key', 'inputs', 'function'])
+
+
+def _efficiency(supply, fresh, extract):
+    """Supply side temperature efficiency of the heat exchanger in %."""
+    if abs(extract - fresh) < 1:
+        return None
+    return round(max(0.0, min(100.0, (supply - fresh) / (extract - fresh) * 100)), 1)
+
+
+def _delta(high, low):
+    return round(high - low, 1)
+
+
+def _recovered_power(flow, supply, fresh):
+    """Heat put back into the supply air in W."""
+    return round(flow * AIR_HEAT_CAPACITY * (supply - fresh))
+
+
+FRESH = ("Sensors", "Fresh_Temp")
+SUPPLY = ("Sensors", "Supply_Temp1")
+EXTRACT = ("Sensors", "Extract_Temp")
+EXHAUST = ("Sensors", "Exhaust_Temp")
+
+DERIVED = [
+    Derived("VirtualSensors", "Efficiency", (SUPPLY, FRESH, EXTRACT), _efficiency),
+    Derived("VirtualSensors", "Supply_Temp_Rise", (SUPPLY, FRESH), _delta),
+    Derived("VirtualSensors", "Extract_Temp_Drop", (EXTRACT, EXHAUST), _delta),
+    Derived("VirtualSensors", "Recovered_Power", (("Sensors", "Supply_Flow"), SUPPLY, FRESH), _recovered_power),
+]
+
+
+class DerivedEngine:
+    """Recompute derived datapoints whose inputs have changed.
+
+    Derived datapoints may use each other as inputs as long as an input is
+    listed before the datapoints using it.
+    """
+
+    def __init__(self, definitions=DERIVED):
+        self.definitions = list(definitions)
+        self.keys = {(d.group, d.key): d for d in self.definitions}
+        self._dependents = {}
+        for position, derived in enumerate(self.definitions):
+            for key in derived.inputs:
+                self._dependents.setdefault(key, []).append(position)
+
+    def inputs(self, group, key):
+        """Inputs of a derived datapoint, None if it is not derived."""
+        derived = self.keys.get((group, key))
+        return None if derived is None else derived.inputs
+
+    def update(self, changed, get_value):
+        """Yield (group, key, value) of every derived datapoint affected by changed.
+
+        The caller stores each value before the next one is computed, so
+        derived datapoints depending on it see the new value.
+        """
+        pending = sorted({p for key in changed for p in self._dependents.get(key, ())})
+        done = set()
+        while pending:
+            position = pending.pop(0)
+            if position in done:
+                continue
+            done.add(position)
+            derived = self.definitions[position]
+            values = [get_value(group, key) for group, key in derived.inputs]
+            value = None if None in values else derived.function(*values)
+            yield derived.group, derived.key, value
+            dependents = [p for p in self._dependents.get((derived.group, derived.key), ()) if p not in done]
+            if dependents:
+                pending = sorted(set(pending) | set(dependents))
@@ -0,0 +1,93 @@
+# Register map discovery
+#
+# Firmware revisions may add, drop or move registers. Discovery scans the
+# address ranges around every group of the register map and records which
+# addresses the unit answers. Registers at addresses it does not answer are
+# left out, and reads never bridge those addresses. The result only depends
+# on model and firmware, so it is shared by every unit running them.
+
+import asyncio
+from datetime import datetime, timezone
+
+from .registers import register_width
+from .snapshot import scan_range
+
+# Addresses scanned before and after the registers of a group
+DISCOVERY_MARGIN = 32
+
+# Stored maps of another version are dropped and the units scanned again
+DISCOVERY_VERSION = 2
+
+# Discovery requests in flight per unit, keeps room for regular polling
+DEFAULT_CONCURRENCY = 2
+
+
+def map_key(model, firmware):
+    return "{}|{}".format(model, firmware)
+
+
+def candidate_ranges(registers, margin=DISCOVERY_MARGIN):
+    """Per table the sorted (start, end) ranges around each group, merged where they overlap."""
+    spans = {}
+    for register in registers:
+        end = register.address + register_width(register)
+        key = (register.table, register.group)
+        low, high = spans.get(key, (register.address, end))
+        spans[key] = (min(low, register.address), max(high, end))
+
+    ranges = {}
+    for (table, _group), (low, high) in sorted(spans.items(), key=lambda item: item[1]):
+        start, end = max(0, low - margin), high + margin
+        table_ranges = ranges.setdefault(table, [])
+        if table_ranges and start <= table_ranges[-1][1]:
+            table_ranges[-1] = (table_ranges[-1][0], max(end, table_ranges[-1][1]))
+        else:
+            table_ranges.append((start, end))
+    return ranges
+
+
+async def discover(device, firmware, margin=DISCOVERY_MARGIN, concurrency=DEFAULT_CONCURRENCY):
+    """Scan the candidate ranges of a unit, concurrently but with at most
+    concurrency requests in flight. Returns a JSON serializable map.
+
+    Only addresses answered with illegal data address count as invalid.
+    Any other exception response fails the discovery, so a busy unit or
+    gateway never leaves registers out for good.
+    """
+    limit = asyncio.Semaphore(concurrency)
+    ranges = candidate_ranges(device.Registers.values(), margin)
+    requests = device.hub.requests
+
+    async def scan(table, start, end):
+        known = [register.address for register in device.Registers.values() if register.table == table]
+        readable, invalid = await scan_range(device, table, start, end, limit=limit, known=known)
+        valid = [(address, address + len(words)) for address, words in readable.items()]
+        return table, start, end, valid, invalid
+
+    tables = {}
+    for table, start, end, valid, invalid in await asyncio.gather(*(
+        scan(table, start, end) for table, table_ranges in ranges.items() for start, end in table_ranges
+    )):
+        entry = tables.setdefault(table, {"scanned": [], "valid": [], "invalid": []})
+        entry["scanned"].append((start, end))
+        entry["valid"].extend(valid)
+        entry["invalid"].extend(invalid)
+
+    return {
+        "version": DISCOVERY_VERSION,
+        "model": device.device_module,
+        "firmware": firmware,
+        "discovered": datetime.now(timezone.utc).isoformat(),
+        "requests": device.hub.requests - requests,
+        "tables": tables,
+    }
+
+
+def invalid_addresses(discovered):
+    """(table, address) of every scanned address the unit did not answer."""
+    return {
+        (table, address)
+        for table, entry in discovered.get("tables", {}).items()
+        for start, end in entry.get("invalid", [])
+        for address in range(start, end)
+    }
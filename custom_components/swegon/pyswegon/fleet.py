@@ -0,0 +1,264 @@
+# Standalone fleet poller
+#
+# Polls many units from one asyncio process, outside Home Assistant, and
+# exposes the values as a Prometheus text endpoint and/or InfluxDB line
+# protocol. Units behind the same gateway share one connection, and the
+# pipeline window bounds the requests in flight per gateway.
+#
+#   python scripts/swegon_fleet.py --config units.yaml --prometheus-port 9502
+#   python scripts/swegon_fleet.py --unit 10.0.0.5 --unit 10.0.0.6:502/2 --line-protocol -
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+
+from .registers import WRITE_ONLY
+from .scheduler import PollScheduler
+from .swegon import Swegon
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60  # Seconds, for groups polled at the scan interval
+DEFAULT_MODEL = "CASA R4"
+
+
+def load_units(path):
+    """Units from a YAML or JSON file, a list under "units" with name, host,
+    and optionally port, slave_id and model."""
+    with open(path, encoding="utf-8") as file:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            config = yaml.safe_load(file)
+        else:
+            config = json.load(file)
+    return [dict(unit) for unit in config.get("units", [])]
+
+
+def parse_unit(spec):
+    """host[:port][/slave_id] as given on the command line."""
+    address, _, slave_id = spec.partition("/")
+    host, _, port = address.partition(":")
+    return {"name": spec, "host": host, "port": int(port or 502), "slave_id": int(slave_id or 1)}
+
+
+def _escape_tag(value):
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class FleetUnit:
+    """One polled unit and its schedule."""
+
+    def __init__(self, name, host, port=502, slave_id=1, model=DEFAULT_MODEL, pipeline_window=1, interval=DEFAULT_INTERVAL):
+        self.name = name
+        self.model = model
+        self.device = Swegon(model, host, port, slave_id, pipeline_window)
+        self.scheduler = PollScheduler(self.device.Registers.values(), interval)
+        self.up = False
+        self.last_poll = None
+        self.polls = 0
+        self.failures = 0
+
+    async def poll(self):
+        """Read what is due, returns the refreshed registers."""
+        due = self.scheduler.due()
+        if not due:
+            return []
+        try:
+            updated = await self.device.readRegisters(due)
+        except Exception as err:
+            _LOGGER.debug("Polling %s failed: %s", self.name, err)
+            self.up = False
+            self.failures += 1
+            return []
+        self.scheduler.mark_polled(updated)
+        self.up = True
+        self.polls += 1
+        self.last_poll = time.time()
+        return updated
+
+    def values(self):
+        """(group, key, value) of every register with a known value."""
+        for (group, key), register in self.device.Registers.items():
+            if (group, key) in WRITE_ONLY:
+                continue
+            value = self.device.getValue(group, key)
+            if isinstance(value, (int, float)):
+                yield group, key, value
+
+
+class FleetPoller:
+    def __init__(self, units, concurrency=None, line_protocol=None):
+        self.units = units
+        self._concurrency = asyncio.Semaphore(concurrency) if concurrency else None
+        self._line_protocol = line_protocol
+        self._tasks = []
+        self._server = None
+
+    async def start(self, prometheus_host="0.0.0.0", prometheus_port=None):
+        if prometheus_port is not None:
+            self._server = await asyncio.start_server(self._serve_metrics, prometheus_host, prometheus_port)
+            _LOGGER.info("Prometheus metrics on %s:%s/metrics", prometheus_host, prometheus_port)
+        self._tasks = [asyncio.ensure_future(self._run(unit)) for unit in self.units]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for unit in self.units:
+            await unit.device.close()
+
+    async def _run(self, unit):
+        # Spread the first polls, so a restart doesn't hit every unit at once
+        tick = unit.scheduler.tick or DEFAULT_INTERVAL
+        await asyncio.sleep(random.uniform(0, min(tick, 10)))
+        while True:
+            if self._concurrency is not None:
+                async with self._concurrency:
+                    updated = await unit.poll()
+            else:
+                updated = await unit.poll()
+            if updated and self._line_protocol is not None:
+                self._write_lines(unit, updated)
+            await asyncio.sleep(tick)
+
+    def _write_lines(self, unit, registers):
+        """One line per group with the refreshed registers as fields."""
+        timestamp = time.time_ns()
+        fields = {}
+        for register in registers:
+            value = unit.device.getValue(register.group, register.key)
+            if isinstance(value, (int, float)):
+                fields.setdefault(register.group, []).append("{}={}".format(_escape_tag(register.key), float(value)))
+        for group, group_fields in fields.items():
+            self._line_protocol.write("swegon,unit={},model={},group={} {} {}\n".format(
+                _escape_tag(unit.name), _escape_tag(unit.model), _escape_tag(group), ",".join(group_fields), timestamp))
+        self._line_protocol.flush()
+
+    def metrics(self):
+        """Prometheus text exposition of every unit."""
+        lines = [
+            "# HELP swegon_up Whether the last poll of the unit succeeded.",
+            "# TYPE swegon_up gauge",
+        ]
+        for unit in self.units:
+            lines.append('swegon_up{{unit="{}"}} {}'.format(_escape_label(unit.name), int(unit.up)))
+        lines += [
+            "# HELP swegon_value Last value read from the unit.",
+            "# TYPE swegon_value gauge",
+        ]
+        for unit in self.units:
+            for group, key, value in unit.values():
+                lines.append('swegon_value{{unit="{}",group="{}",key="{}"}} {}'.format(
+                    _escape_label(unit.name), group, key, float(value)))
+        lines += [
+            "# HELP swegon_poll_failures_total Polls that failed.",
+            "# TYPE swegon_poll_failures_total counter",
+        ]
+        for unit in self.units:
+            lines.append('swegon_poll_failures_total{{unit="{}"}} {}'.format(_escape_label(unit.name), unit.failures))
+
+        hubs = {}
+        for unit in self.units:
+            hubs.setdefault((unit.device.ip, unit.device.port), unit.device.hub)
+        lines += [
+            "# HELP swegon_modbus_requests_total Modbus requests sent to the gateway.",
+            "# TYPE swegon_modbus_requests_total counter",
+        ]
+        for (host, port), hub in hubs.items():
+            summary = hub.metrics.summary()
+            lines.append('swegon_modbus_requests_total{{gateway="{}:{}"}} {}'.format(host, port, summary["Requests"]))
+        lines += [
+            "# HELP swegon_modbus_timeouts_total Modbus requests without a response.",
+            "# TYPE swegon_modbus_timeouts_total counter",
+        ]
+        for (host, port), hub in hubs.items():
+            lines.append('swegon_modbus_timeouts_total{{gateway="{}:{}"}} {}'.format(host, port, hub.metrics.summary()["Timeouts"]))
+        return "\n".join(lines) + "\n"
+
+    async def _serve_metrics(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            path = request.split(b" ")[1] if request.count(b" ") >= 2 else b"/"
+            if path.split(b"?")[0] in (b"/", b"/metrics"):
+                body = self.metrics().encode()
+                status = b"200 OK"
+            else:
+                body = b"Not found\n"
+                status = b"404 Not Found"
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + "Content-Length: {}\r\nConnection: close\r\n\r\n".format(len(body)).encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _run(args):
+    units = []
+    if args.config:
+        units.extend(load_units(args.config))
+    units.extend(parse_unit(spec) for spec in args.unit or [])
+    if not units:
+        raise SystemExit("No units given, use --config or --unit")
+
+    fleet = [
+        FleetUnit(
+            unit.get("name", unit["host"]), unit["host"], unit.get("port", 502), unit.get("slave_id", 1),
+            unit.get("model", args.model), args.pipeline_window, args.interval)
+        for unit in units
+    ]
+
+    line_protocol = None
+    if args.line_protocol == "-":
+        line_protocol = sys.stdout
+    elif args.line_protocol:
+        line_protocol = open(args.line_protocol, "a", encoding="utf-8")
+
+    poller = FleetPoller(fleet, args.concurrency, line_protocol)
+    await poller.start(args.prometheus_host, args.prometheus_port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await poller.stop()
+        if line_protocol not in (None, sys.stdout):
+            line_protocol.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll a fleet of Swegon CASA units over Modbus TCP")
+    parser.add_argument("--config", help="YAML or JSON file with a list of units")
+    parser.add_argument("--unit", action="append", help="host[:port][/slave_id], may be given more than once")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model of units that don't name one")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="seconds, for groups without their own interval")
+    parser.add_argument("--pipeline-window", type=int, default=1, help="requests in flight per gateway")
+    parser.add_argument("--concurrency", type=int, default=None, help="units polled at the same time")
+    parser.add_argument("--prometheus-host", default="0.0.0.0")
+    parser.add_argument("--prometheus-port", type=int, default=None)
+    parser.add_argument("--line-protocol", help="file to append line protocol to, - for stdout")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, stream=sys.stderr)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
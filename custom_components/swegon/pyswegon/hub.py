@@ -0,0 +1,256 @@
+# Shared Modbus TCP connections
+#
+# Units behind the same gateway (same ip:port, different slave id) share one
+# hub, so the gateway sees a single connection no matter how many units are
+# configured.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from .breaker import CircuitBreaker
+from .metrics import TransportMetrics
+from .modbus import async_load_client, io_error
+from .pipeline import PipelinedModbusTcpClient
+
+_LOGGER = logging.getLogger(__name__)
+
+# Request priorities, lower goes first. User actions are interactive, polls
+# run in the background.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Polls in a row with mismatched responses before pipelining is turned off
+PIPELINE_FALLBACK_POLLS = 3
+
+# Polls one request at a time before pipelining is tried again
+PIPELINE_RESTORE_POLLS = 100
+
+
+class ModbusHub:
+    """One Modbus TCP connection shared by every unit on a gateway.
+
+    Requests from all units pass through a gate that allows at most
+    `window` requests in flight. A window of 1 serializes the requests
+    over a pymodbus client. A larger window multiplexes them over a
+    pipelined client that matches the responses by transaction id, as
+    pymodbus only sends one request at a time.
+
+    Gateways that mix up pipelined responses poll one request at a time
+    for a while, then the configured window is tried again.
+
+    Failed connects back off exponentially, requests in between fail at
+    once instead of each trying to connect to a dead gateway.
+
+    Waiting requests are let through by priority, then in order of arrival,
+    so a user action only waits for the requests already in flight and not
+    for a queued poll.
+    """
+
+    _hubs = {}
+
+    def __init__(self, host, port, window=1):
+        self.host = host
+        self.port = port
+        self.window = max(1, window)
+        self.pipeline_window = self.window  # Configured, window drops to 1 on mismatches
+        self.mismatches = 0
+        self._mismatches_seen = 0
+        self._mismatch_polls = 0
+        self._fallback_polls = None  # Polls since pipelining was turned off
+        self._client = None
+        self._users = 0
+        self._connect_lock = asyncio.Lock()
+        self._waiters = []  # Heap of (priority, arrival, future)
+        self._arrival = itertools.count()
+        self._backoff = CircuitBreaker(failure_threshold=1, base_delay=1)
+
+        # Statistics
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.wait_time_last = 0.0
+        self.metrics = TransportMetrics()
+        self._unit_metrics = {}
+
+    @classmethod
+    def acquire(cls, host, port, window=1):
+        """Return the hub for host:port, creating it on first use."""
+        hub = cls._hubs.get((host, port))
+        if hub is None:
+            hub = cls(host, port, window)
+            cls._hubs[(host, port)] = hub
+        else:
+            hub.pipeline_window = max(hub.pipeline_window, window)
+            if hub._fallback_polls is None:
+                hub.window = hub.pipeline_window
+                hub._wake()
+        hub._users += 1
+        return hub
+
+    async def release(self):
+        """Drop one user, the connection is closed when the last one leaves."""
+        self._users -= 1
+        if self._users > 0:
+            return
+        if ModbusHub._hubs.get((self.host, self.port)) is self:
+            del ModbusHub._hubs[(self.host, self.port)]
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def unit_metrics(self, slave_id):
+        """Metrics of the requests to one unit behind the gateway, metrics
+        covers all of them. Connects are only counted for the gateway."""
+        metrics = self._unit_metrics.get(slave_id)
+        if metrics is None:
+            metrics = self._unit_metrics[slave_id] = TransportMetrics()
+        return metrics
+
+    @property
+    def connected(self):
+        return self._client is not None and self._client.connected
+
+    @property
+    def wait_time_avg(self):
+        return self.wait_time_total / self.requests if self.requests else 0.0
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "wait_time_avg": round(self.wait_time_avg, 4),
+            "wait_time_max": round(self.wait_time_max, 4),
+            "wait_time_last": round(self.wait_time_last, 4),
+        }
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._client is not None and self._client.connected:
+                return
+            self._backoff.check("{}:{}".format(self.host, self.port))
+            if self._client is not None:
+                self._client.close()
+            _LOGGER.debug("Connecting to Modbus gateway %s:%s", self.host, self.port)
+            connected = False
+            started = None
+            try:
+                # The pipelined client only needs the pymodbus exceptions
+                client = await async_load_client()
+                if self.window > 1:
+                    self._client = PipelinedModbusTcpClient(self.host, self.port, on_mismatch=self._record_mismatch)
+                else:
+                    # Reconnects are paced by the hub, not in the background by pymodbus
+                    self._client = client.AsyncModbusTcpClient(host=self.host, port=self.port, reconnect_delay=0)
+                started = time.monotonic()
+                try:
+                    await self._client.connect()
+                except Exception:
+                    pass
+                connected = self._client.connected
+            finally:
+                # A connect cancelled by a deadline or an unload failed as
+                # well, else a half open breaker would wait for it forever
+                if started is not None:
+                    self.metrics.record_connect(time.monotonic() - started, connected)
+                if connected:
+                    self._backoff.record_success()
+                else:
+                    self._backoff.record_failure()
+            if not connected:
+                raise io_error("Failed to connect to {}:{}".format(self.host, self.port))
+
+    def _record_mismatch(self):
+        self.mismatches += 1
+
+    def record_poll(self):
+        """Called after every poll of a unit on the gateway.
+
+        Pipelining is turned off once PIPELINE_FALLBACK_POLLS polls in a row
+        saw mismatched responses, and tried again after PIPELINE_RESTORE_POLLS
+        polls one request at a time.
+        """
+        mismatched = self.mismatches != self._mismatches_seen
+        self._mismatches_seen = self.mismatches
+        if self._fallback_polls is not None:
+            self._fallback_polls += 1
+            if self._fallback_polls >= PIPELINE_RESTORE_POLLS:
+                _LOGGER.info("Trying pipelined requests to %s:%s again", self.host, self.port)
+                self._fallback_polls = None
+                self.window = self.pipeline_window
+                self._wake()
+            return
+        if self.window == 1:
+            return
+        self._mismatch_polls = self._mismatch_polls + 1 if mismatched else 0
+        if self._mismatch_polls >= PIPELINE_FALLBACK_POLLS:
+            _LOGGER.info("%s:%s does not handle pipelined requests, falling back to one at a time", self.host, self.port)
+            self._mismatch_polls = 0
+            self._fallback_polls = 0
+            self.window = 1
+
+    async def _acquire(self, priority):
+        """Wait for a free slot in the window."""
+        if self.in_flight < self.window and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrival), future))
+        self.queue_depth += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancel
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self.queue_depth -= 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        """Hand free slots to the waiting requests with the highest priority."""
+        while self._waiters and self.in_flight < self.window:
+            _priority, _arrival, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def execute(self, method, *args, priority=PRIORITY_BACKGROUND, **kwargs):
+        """Run a pymodbus client call once the gate lets it through."""
+        queued = time.monotonic()
+        await self._acquire(priority)
+
+        waited = time.monotonic() - queued
+        self.requests += 1
+        self.wait_time_total += waited
+        self.wait_time_last = waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        unit = self.unit_metrics(kwargs.get("slave"))
+        self.metrics.queue_wait.observe(waited)
+        unit.queue_wait.observe(waited)
+
+        try:
+            await self.connect()
+            sent = time.monotonic()
+            try:
+                response = await getattr(self._client, method)(*args, **kwargs)
+            except Exception:
+                self.metrics.record_failure(method, args, kwargs)
+                unit.record_failure(method, args, kwargs)
+                raise
+            latency = time.monotonic() - sent
+            self.metrics.record_request(method, args, kwargs, response, latency)
+            unit.record_request(method, args, kwargs, response, latency)
+            return response
+        finally:
+            self._release()
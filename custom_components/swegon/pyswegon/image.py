@@ -0,0 +1,306 @@
+# Compact register image
+#
+# Raw registers are kept as they came off the wire, one contiguous array per
+# Modbus table, and only decoded when a value is asked for. A table is decoded
+# as a whole, with one struct.unpack compiled from the register map, and the
+# result is kept until the table is written to again.
+
+import struct
+from array import array
+from collections.abc import Mapping
+from types import SimpleNamespace
+
+from .registers import WRITE_ONLY, register_width
+
+
+def _convert(register, raw):
+    """Scale a signed or unsigned raw value, None for the sentinel."""
+    if raw == register.sentinel:
+        return None
+    if register.scale == 1 and not register.offset:
+        return raw
+    return round(raw * register.scale + register.offset, 3)
+
+
+def decode(register, raw):
+    """Decode raw register words into an engineering value."""
+    if register_width(register) == 2:
+        raw = (raw[0] << 16) | raw[1]
+        if register.data_type == "int32" and raw > 0x7FFFFFFF:
+            raw -= 0x100000000
+    else:
+        raw = raw[0]
+        if register.data_type == "int16" and raw > 0x7FFF:
+            raw -= 0x10000
+    return _convert(register, raw)
+
+
+def encode(register, value):
+    """Encode an engineering value into raw register words, high word first
+    like decode reads them. Raises ValueError if it doesn't fit the type."""
+    raw = int(round((float(value) - register.offset) / register.scale))
+    bits = 16 * register_width(register)
+    if register.data_type.startswith("int"):
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    else:
+        low, high = 0, (1 << bits) - 1
+    if not low <= raw <= high:
+        raise ValueError("{} is out of range for {}/{}".format(value, register.group, register.key))
+    raw &= (1 << bits) - 1
+    if bits == 32:
+        return [raw >> 16, raw & 0xFFFF]
+    return [raw]
+
+
+class TableDecoder:
+    """Decodes every register of one table in a single struct.unpack.
+
+    Each register is a field of a native byte order struct laid over the
+    raw array, unmapped words are padding. 16 bit registers come out of
+    the unpack signed or unsigned as declared, 32 bit ones as two words
+    that are joined afterwards. Registers overlapping an earlier one are
+    left to decode().
+    """
+
+    def __init__(self, base, size, registers):
+        fmt = ["="]
+        self.fields = []
+        self.overlapping = []
+        # Register decoded at each word offset, and its width
+        self.owner = [None] * size
+        self.width = [0] * size
+        position = 0
+        for register in sorted(registers, key=lambda r: r.address):
+            offset = register.address - base
+            if offset < position:
+                self.overlapping.append(register)
+                continue
+            if offset > position:
+                fmt.append("{}x".format(2 * (offset - position)))
+            width = register_width(register)
+            if width == 2:
+                fmt.append("HH")
+            else:
+                fmt.append("h" if register.data_type == "int16" else "H")
+            self.fields.append((offset, register, width))
+            self.owner[offset] = register
+            self.width[offset] = width
+            position = offset + width
+        if size > position:
+            fmt.append("{}x".format(2 * (size - position)))
+        self._struct = struct.Struct("".join(fmt))
+        self._size = size
+
+    def decode(self, raw):
+        """Decoded value of every register, indexed by word offset."""
+        values = self._struct.unpack(raw)
+        decoded = [None] * self._size
+        i = 0
+        for offset, register, width in self.fields:
+            value = values[i]
+            if width == 2:
+                value = (value << 16) | values[i + 1]
+                if register.data_type == "int32" and value > 0x7FFFFFFF:
+                    value -= 0x100000000
+            decoded[offset] = _convert(register, value)
+            i += width
+        return decoded
+
+
+class RegisterImage:
+    """Raw register values of one unit.
+
+    Each table is one array('H') spanning the lowest to the highest mapped
+    address, with a parallel bytearray marking which words have been read.
+    """
+
+    def __init__(self, registers):
+        self.registers = {}
+        self.groups = {}
+        spans = {}
+        for register in registers:
+            if (register.group, register.key) in WRITE_ONLY:
+                continue
+            self.registers[(register.group, register.key)] = register
+            self.groups.setdefault(register.group, []).append(register.key)
+            end = register.address + register_width(register)
+            low, high = spans.get(register.table, (register.address, end))
+            spans[register.table] = (min(low, register.address), max(high, end))
+
+        self._base = {}
+        self._raw = {}
+        self._valid = {}
+        self._index = {}
+        self._decoders = {}
+        self._decoded = {}
+        for table, (low, high) in spans.items():
+            self._base[table] = low
+            self._raw[table] = array('H', bytes(2 * (high - low)))
+            self._valid[table] = bytearray(high - low)
+            self._index[table] = [()] * (high - low)
+            self._decoders[table] = TableDecoder(
+                low, high - low, [r for r in self.registers.values() if r.table == table])
+        for register in self.registers.values():
+            offset = register.address - self._base[register.table]
+            self._index[register.table][offset] += ((register, register_width(register)),)
+
+    def store(self, table, address, values):
+        """Store words read from the device.
+
+        Returns the mapped registers that were refreshed and the ones whose
+        raw value changed.
+        """
+        if table not in self._base:
+            return [], []
+        raw = self._raw[table]
+        valid = self._valid[table]
+        index = self._index[table]
+        start = address - self._base[table]
+        first = max(start, 0)
+        last = min(start + len(values), len(raw))
+        if first >= last:
+            return [], []
+
+        words = array('H', values[first - start:last - start])
+        changed_words = set()
+        if raw[first:last] != words or valid.find(0, first, last) != -1:
+            for offset in range(first, last):
+                if raw[offset] != words[offset - first] or not valid[offset]:
+                    changed_words.add(offset)
+        raw[first:last] = words
+        valid[first:last] = b'\x01' * (last - first)
+        if changed_words:
+            self._decoded.pop(table, None)
+
+        refreshed = []
+        changed = []
+        for offset in range(first, last):
+            for register, width in index[offset]:
+                if offset + width > last:
+                    continue
+                refreshed.append(register)
+                if changed_words and (offset in changed_words or (width == 2 and offset + 1 in changed_words)):
+                    changed.append(register)
+        return refreshed, changed
+
+    def invalidate(self, table, address, count):
+        """Forget words whose value is no longer known, returns the affected registers."""
+        if table not in self._base:
+            return []
+        start = address - self._base[table]
+        first = max(start, 0)
+        last = min(start + count, len(self._raw[table]))
+        if first >= last:
+            return []
+        self._valid[table][first:last] = bytes(last - first)
+        self._decoded.pop(table, None)
+        affected = []
+        for register in self.registers.values():
+            if register.table != table:
+                continue
+            offset = register.address - self._base[table]
+            if offset < last and offset + register_width(register) > first:
+                affected.append(register)
+        return affected
+
+    def snapshot(self):
+        """Raw words and validity of every table, JSON serializable."""
+        return {
+            table: {"base": self._base[table], "raw": self._raw[table].tolist(), "valid": self._valid[table].hex()}
+            for table in self._base
+        }
+
+    def restore(self, snapshot):
+        """Load a snapshot, returns the registers that got a value.
+
+        Tables whose span no longer matches the register map are skipped.
+        """
+        restored = []
+        for table, data in snapshot.items():
+            if table not in self._base or data.get("base") != self._base[table]:
+                continue
+            raw = data.get("raw", [])
+            valid = bytes.fromhex(data.get("valid", ""))
+            if len(raw) != len(self._raw[table]) or len(valid) != len(raw):
+                continue
+            self._raw[table] = array('H', raw)
+            self._valid[table] = bytearray(valid)
+            self._decoded.pop(table, None)
+            restored.extend(
+                register for register in self.registers.values()
+                if register.table == table and self.raw(register) is not None
+            )
+        return restored
+
+    def raw(self, register):
+        """Raw words of a register, None until it has been read."""
+        offset = register.address - self._base[register.table]
+        width = register_width(register)
+        if self._valid[register.table].find(0, offset, offset + width) != -1:
+            return None
+        return self._raw[register.table][offset:offset + width]
+
+    def get(self, register):
+        """Decoded value of a register, None until it has been read."""
+        table = register.table
+        offset = register.address - self._base[table]
+        decoder = self._decoders[table]
+        if decoder.owner[offset] is not register:
+            raw = self.raw(register)
+            return None if raw is None else decode(register, raw)
+        if self._valid[table].find(0, offset, offset + decoder.width[offset]) != -1:
+            return None
+        decoded = self._decoded.get(table)
+        if decoded is None:
+            decoded = self._decoded[table] = decoder.decode(self._raw[table])
+        return decoded[offset]
+
+
+class DatapointsView(Mapping):
+    """Read-only view giving the old Datapoints[group][key].Value access.
+
+    Values come from the register image, or from the plain values dict for
+    datapoints that are not registers (device info, summaries).
+    """
+
+    def __init__(self, image, values):
+        self._image = image
+        self._values = values
+
+    def __getitem__(self, group):
+        if group not in self._image.groups and group not in self._values:
+            raise KeyError(group)
+        return _GroupView(self._image, self._values, group)
+
+    def __iter__(self):
+        yield from self._image.groups
+        for group in self._values:
+            if group not in self._image.groups:
+                yield group
+
+    def __len__(self):
+        return len(set(self._image.groups) | set(self._values))
+
+
+class _GroupView(Mapping):
+    def __init__(self, image, values, group):
+        self._image = image
+        self._values = values.get(group, {})
+        self._group = group
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return SimpleNamespace(Value=self._values[key])
+        register = self._image.registers.get((self._group, key))
+        if register is None:
+            raise KeyError(key)
+        return SimpleNamespace(Value=self._image.get(register))
+
+    def __iter__(self):
+        yield from self._image.groups.get(self._group, ())
+        for key in self._values:
+            if (self._group, key) not in self._image.registers:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,169 @@
+# Transport level metrics for a Modbus connection
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Client methods and their Modbus function codes
+FUNCTION_CODES = {
+    "read_holding_registers": 3,
+    "read_input_registers": 4,
+    "write_register": 6,
+    "write_registers": 16,
+    "readwrite_registers": 23,
+}
+
+# MBAP header in front of every PDU
+MBAP_SIZE = 7
+
+
+class Histogram:
+    """Fixed bucket histogram, cheap enough to update on every request."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the given percentile."""
+        if not self.count:
+            return None
+        target = pct / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+def request_size(method, args, kwargs):
+    """Bytes on the wire for a request."""
+    if method == "write_registers":
+        return MBAP_SIZE + 6 + 2 * len(args[1] if len(args) > 1 else kwargs.get("values", ()))
+    if method == "readwrite_registers":
+        return MBAP_SIZE + 10 + 2 * len(kwargs.get("values", ()))
+    return MBAP_SIZE + 5
+
+
+def response_size(method, response):
+    """Bytes on the wire for a response."""
+    if response.isError():
+        return MBAP_SIZE + 2
+    if method in ("read_holding_registers", "read_input_registers", "readwrite_registers"):
+        return MBAP_SIZE + 2 + 2 * len(response.registers)
+    return MBAP_SIZE + 5
+
+
+class TransportMetrics:
+    """Counters and latency histograms of one Modbus connection.
+
+    Request latency is measured from sending to the response, so it covers
+    the gateway and the device. Time spent waiting for a free slot on the
+    connection and time spent connecting are kept apart.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.errors = {}
+        self.timeouts = {}
+        self.latency = {}
+        self.queue_wait = Histogram()
+        self.connect_time = Histogram()
+        self.connects = 0
+        self.connect_failures = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    @property
+    def reconnects(self):
+        return max(0, self.connects - 1)
+
+    def record_request(self, method, args, kwargs, response, latency):
+        fc = FUNCTION_CODES.get(method, 0)
+        self.requests[fc] = self.requests.get(fc, 0) + 1
+        if response.isError():
+            self.errors[fc] = self.errors.get(fc, 0) + 1
+        self.latency.setdefault(fc, Histogram()).observe(latency)
+        self.bytes_out += request_size(method, args, kwargs)
+        self.bytes_in += response_size(method, response)
+
+    def record_failure(self, method, args, kwargs):
+        """A request that got no response at all."""
+        fc = FUNCTION_CODES.get(method, 0)
+        self.requests[fc] = self.requests.get(fc, 0) + 1
+        self.timeouts[fc] = self.timeouts.get(fc, 0) + 1
+        self.bytes_out += request_size(method, args, kwargs)
+
+    def record_connect(self, duration, success):
+        if success:
+            self.connects += 1
+            self.connect_time.observe(duration)
+        else:
+            self.connect_failures += 1
+
+    def total(self, counters):
+        return sum(counters.values())
+
+    def latency_percentile(self, pct):
+        """Request latency percentile in seconds over all function codes."""
+        merged = Histogram()
+        for histogram in self.latency.values():
+            merged.count += histogram.count
+            merged.sum += histogram.sum
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+        return merged.percentile(pct)
+
+    def summary(self):
+        """Flat values for diagnostic sensors."""
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        wait = self.queue_wait.mean
+        return {
+            "Requests": self.total(self.requests),
+            "Errors": self.total(self.errors),
+            "Timeouts": self.total(self.timeouts),
+            "Reconnects": self.reconnects,
+            "Latency_P50": None if p50 is None else round(p50 * 1000, 1),
+            "Latency_P95": None if p95 is None else round(p95 * 1000, 1),
+            "Queue_Wait": None if wait is None else round(wait * 1000, 1),
+            "Bytes_Out": self.bytes_out,
+            "Bytes_In": self.bytes_in,
+        }
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency": {fc: histogram.as_dict() for fc, histogram in self.latency.items()},
+            "queue_wait": self.queue_wait.as_dict(),
+            "connect_time": self.connect_time.as_dict(),
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+        }
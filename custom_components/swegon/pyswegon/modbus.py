@@ -0,0 +1,31 @@
+# Lazy pymodbus import
+#
+# Importing pymodbus takes close to 100 ms, long enough to stall the Home
+# Assistant event loop. The client is imported in an executor before the
+# first connection, and the exception type is only looked up when raised.
+
+import asyncio
+import importlib
+import sys
+
+CLIENT_MODULE = "pymodbus.client"
+
+# The only exception code that means the unit does not have an address.
+# Others, e.g. busy or gateway target failed to respond, are temporary.
+ILLEGAL_DATA_ADDRESS = 0x02
+
+
+async def async_load_client():
+    """The pymodbus.client module, imported in an executor the first time."""
+    module = sys.modules.get(CLIENT_MODULE)
+    if module is None:
+        module = await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, CLIENT_MODULE)
+    return module
+
+
+def io_error(message):
+    """A ModbusIOException. pymodbus is loaded by the time requests are made,
+    so the import is a lookup."""
+    from pymodbus.exceptions import ModbusIOException
+
+    return ModbusIOException(message)
@@ -0,0 +1,148 @@
+# Pipelined Modbus TCP client
+#
+# pymodbus sends one request at a time per client. This client keeps several
+# transactions in flight on one connection and matches the responses back by
+# MBAP transaction id. It only implements the requests pyswegon uses.
+#
+# Gateways that don't handle overlapping requests give themselves away with
+# responses that match no request in flight or the wrong one. Those are
+# reported to on_mismatch, an exception response is not a sign of that.
+
+import asyncio
+import logging
+import struct
+
+from .modbus import io_error
+
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 3  # Seconds
+
+_MBAP = struct.Struct(">HHHB")
+
+
+class PipelinedResponse:
+    """Response with the parts of the pymodbus response API pyswegon uses."""
+
+    def __init__(self, function_code, registers=None, exception_code=None):
+        self.function_code = function_code
+        self.registers = registers or []
+        self.exception_code = exception_code
+
+    def isError(self):
+        return self.exception_code is not None
+
+    def __repr__(self):
+        if self.isError():
+            return "PipelinedResponse(fc={}, exception={})".format(self.function_code, self.exception_code)
+        return "PipelinedResponse(fc={}, registers={})".format(self.function_code, self.registers)
+
+
+class PipelinedModbusTcpClient:
+    """Modbus TCP client with several transactions in flight at once."""
+
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT, on_mismatch=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._on_mismatch = on_mismatch
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+        self._pending = {}
+        self._next_tid = 0
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self._receiver = asyncio.ensure_future(self._receive())
+        return True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._receiver is not None:
+            self._receiver.cancel()
+        self._fail_pending(io_error("Connection closed"))
+
+    def _mismatch(self, reason, *args):
+        _LOGGER.debug("Mismatched response from %s:%s: " + reason, self.host, self.port, *args)
+        if self._on_mismatch is not None:
+            self._on_mismatch()
+
+    def _fail_pending(self, err):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(err)
+
+    async def _receive(self):
+        """Hand every response frame to the request with its transaction id."""
+        try:
+            while True:
+                header = await self._reader.readexactly(_MBAP.size)
+                tid, _protocol, length, _unit = _MBAP.unpack(header)
+                pdu = await self._reader.readexactly(length - 1)
+                future = self._pending.pop(tid, None)
+                if future is None:
+                    self._mismatch("dropping response with unknown transaction id %s", tid)
+                elif not future.done():
+                    future.set_result(pdu)
+        except (asyncio.IncompleteReadError, ConnectionError) as err:
+            _LOGGER.debug("Connection to %s:%s lost: %s", self.host, self.port, err)
+            if len(self._pending) > 1:
+                self._mismatch("connection closed with %s requests in flight", len(self._pending))
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._fail_pending(io_error("Connection lost"))
+
+    async def _transact(self, slave, pdu):
+        if not self.connected:
+            raise io_error("Not connected to {}:{}".format(self.host, self.port))
+        self._next_tid = (self._next_tid + 1) & 0xFFFF
+        tid = self._next_tid
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tid] = future
+        self._writer.write(_MBAP.pack(tid, 0, len(pdu) + 1, slave) + pdu)
+        try:
+            response = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(tid, None)
+            raise io_error("No response to transaction {} from {}:{}".format(tid, self.host, self.port))
+        if response[0] & 0x7F != pdu[0]:
+            self._mismatch("function code %s in response to %s", response[0], pdu[0])
+            raise io_error("Response to transaction {} from {}:{} does not match its request".format(
+                tid, self.host, self.port))
+        return self._parse(pdu[0], response)
+
+    @staticmethod
+    def _parse(function_code, pdu):
+        if pdu[0] == function_code | 0x80:
+            return PipelinedResponse(function_code, exception_code=pdu[1])
+        if function_code in (3, 4, 23):
+            count = pdu[1] // 2
+            return PipelinedResponse(function_code, list(struct.unpack_from(">{}H".format(count), pdu, 2)))
+        return PipelinedResponse(function_code)
+
+    async def read_holding_registers(self, address, count=1, slave=1):
+        return await self._transact(slave, struct.pack(">BHH", 3, address, count))
+
+    async def read_input_registers(self, address, count=1, slave=1):
+        return await self._transact(slave, struct.pack(">BHH", 4, address, count))
+
+    async def write_register(self, address, value, slave=1):
+        return await self._transact(slave, struct.pack(">BHH", 6, address, value))
+
+    async def write_registers(self, address, values, slave=1):
+        pdu = struct.pack(">BHHB", 16, address, len(values), 2 * len(values))
+        return await self._transact(slave, pdu + struct.pack(">{}H".format(len(values)), *values))
+
+    async def readwrite_registers(self, read_address=0, read_count=0, write_address=0, values=(), slave=1):
+        pdu = struct.pack(">BHHHHB", 23, read_address, read_count, write_address, len(values), 2 * len(values))
+        return await self._transact(slave, pdu + struct.pack(">{}H".format(len(values)), *values))
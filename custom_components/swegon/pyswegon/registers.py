@@ -0,0 +1,230 @@
+# Declarative register map for Swegon CASA units (SCB 3.0)
+#
+# Addresses are zero-based, i.e. 3x6201 in the commissioning record is 6200 here.
+# The same map drives reading, decoding and writing, so a datapoint is only
+# described once.
+
+from collections import namedtuple
+
+# Modbus tables
+INPUT = "input"
+HOLDING = "holding"
+
+# Largest number of registers a single read request (FC3/FC4) may return
+MAX_READ_COUNT = 125
+
+# Largest hole between two wanted registers that is read through instead of
+# starting a new request. A hole costs 2 bytes per register on the wire, a new
+# request costs a full round trip, so bridging small holes is always cheaper.
+DEFAULT_MAX_GAP = 16
+
+# Raw value of a temperature sensor that is not connected
+SENSOR_MISSING = -32768
+
+# data_type: int16, uint16, int32, uint32 (high word first)
+# scale: raw value is multiplied by this
+# writable: holding registers that may be written
+# interval: poll interval in seconds, overrides the group interval
+# offset: added after scaling
+# sentinel: raw value meaning "no value", decoded as None
+Register = namedtuple(
+    'Register',
+    ['group', 'key', 'table', 'address', 'data_type', 'scale', 'writable', 'interval', 'offset', 'sentinel'],
+    defaults=["uint16", 1, False, None, 0, None],
+)
+
+# A planned read request covering one or more registers
+ReadBlock = namedtuple('ReadBlock', ['table', 'address', 'count', 'registers'])
+
+
+# Poll interval per group in seconds, None means the configured scan interval.
+# Groups that are not listed are only read on demand.
+GROUP_INTERVALS = {
+    "Alarms": None,
+    "Sensors": 30,
+    "Sensors2": 60,
+    "UnitStatuses": 30,
+    "Commands": 10,
+    "Setpoints": 10800,
+}
+
+# Registers polled at their own pace
+REGISTER_INTERVALS = {
+    ("Alarms", "Filter_Guard"): 3600,
+}
+
+
+def _alarms(start, keys):
+    return [
+        Register("Alarms", key, INPUT, start + i, interval=REGISTER_INTERVALS.get(("Alarms", key)))
+        for i, key in enumerate(keys)
+    ]
+
+
+# Alarm registers 3x6101 - 3x6140, one register per alarm
+ALARM_KEYS = [
+    "Fire_Alarm", "Rotor_Guard", "Supply_Fan_Fault", "Exhaust_Fan_Fault",
+    "Fresh_Temp_Fault", "Supply_Temp1_Fault", "Supply_Temp2_Fault", "Extract_Temp_Fault",
+    "Exhaust_Temp_Fault", "Room_Temp_Fault", "UP1_Temp_Fault", "UP2_Temp_Fault",
+    "WR_Temp_Fault", "PreHeat_Temp_Fault", "ExtFresh_Temp_Fault", "CO2_Fault",
+    "RH_Fault", "VOC_Fault", "Supply_Pressure_Fault", "Exhaust_Pressure_Fault",
+    "Supply_Temp_Low", "Supply_Temp_High", "Frost_Protection", "Reheater_Overheat",
+    "Preheater_Overheat", "WR_Frost", "Communication_Fault", "External_Stop",
+    "Service_Reminder", "Filter_Guard", "Filter_Change", "Bypass_Fault",
+    "Damper_Fault", "Condensation", "Emergency_Stop", "Sensor_Config",
+    "Power_Fault", "Battery_Low", "Internal_Error", "Unit_Overheat",
+]
+
+CASA_REGISTERS = [
+    # --- Alarms (Input Registers 3x) ---
+    *_alarms(6100, ALARM_KEYS),
+
+    # --- Measurements (Input Registers 3x) ---
+    Register("Sensors", "Fresh_Temp", INPUT, 6200, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "Supply_Temp1", INPUT, 6201, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "Supply_Temp2", INPUT, 6202, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "Extract_Temp", INPUT, 6203, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "Exhaust_Temp", INPUT, 6204, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "Room_Temp", INPUT, 6205, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "UP1_Temp", INPUT, 6206, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "UP2_Temp", INPUT, 6207, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "WR_Temp", INPUT, 6208, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "PreHeat_Temp", INPUT, 6209, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "ExtFresh_Temp", INPUT, 6210, "int16", 0.1, sentinel=SENSOR_MISSING),
+    Register("Sensors", "C02_Unf", INPUT, 6211, "uint16", 1),
+    Register("Sensors", "CO2_Fil", INPUT, 6212, "uint16", 1),
+    Register("Sensors", "RH", INPUT, 6213, "uint16", 1),
+    Register("Sensors", "AH", INPUT, 6214, "uint16", 0.1),
+    Register("Sensors", "AH_SP", INPUT, 6215, "uint16", 0.1),
+    Register("Sensors", "VOC", INPUT, 6216, "uint16", 1),
+    Register("Sensors", "Supply_Pressure", INPUT, 6217, "int16", 1),
+    Register("Sensors", "Exhaust_Pressure", INPUT, 6218, "int16", 1),
+    Register("Sensors", "Supply_Flow", INPUT, 6219, "uint16", 1),
+    Register("Sensors", "Exhaust_Flow", INPUT, 6220, "uint16", 1),
+    Register("Sensors2", "Heat_Exchanger", INPUT, 6233, "uint16", 1),
+
+    # --- Unit statuses (Input Registers 3x) ---
+    Register("UnitStatuses", "Unit_State", INPUT, 6300, "uint16", 1),
+    Register("UnitStatuses", "Speed_State", INPUT, 6301, "uint16", 1),
+    Register("UnitStatuses", "Supply_Fan", INPUT, 6302, "uint16", 1),
+    Register("UnitStatuses", "Exhaust_Fan", INPUT, 6303, "uint16", 1),
+    Register("UnitStatuses", "Supply_Fan_RPM", INPUT, 6304, "uint16", 1),
+    Register("UnitStatuses", "Exhaust_Fan_RPM", INPUT, 6305, "uint16", 1),
+    Register("UnitStatuses", "Heating_Output", INPUT, 6306, "uint16", 1),
+
+    # --- Commands (Holding Registers 4x) ---
+    Register("Commands", "Op_Mode", HOLDING, 5000, "uint16", 1, True),
+    Register("Commands", "Fireplace_Mode", HOLDING, 5001, "uint16", 1, True),
+    Register("Commands", "Travelling_Mode", HOLDING, 5002, "uint16", 1, True),
+    Register("Commands", "Smart_Mode", HOLDING, 5018, "uint16", 1, True),
+
+    # --- Setpoints (Holding Registers 4x) ---
+    Register("Setpoints", "Temp_SP", HOLDING, 5100, "int16", 0.1, True),
+
+    # --- Configuration parameters (Holding Registers 4x) ---
+    Register("Config", "Away_Supply_Fan", HOLDING, 5300, "uint16", 1, True),
+    Register("Config", "Away_Exhaust_Fan", HOLDING, 5301, "uint16", 1, True),
+    Register("Config", "Home_Supply_Fan", HOLDING, 5302, "uint16", 1, True),
+    Register("Config", "Home_Exhaust_Fan", HOLDING, 5303, "uint16", 1, True),
+    Register("Config", "Boost_Supply_Fan", HOLDING, 5304, "uint16", 1, True),
+    Register("Config", "Boost_Exhaust_Fan", HOLDING, 5305, "uint16", 1, True),
+    Register("Config", "Fireplace_Supply_Fan", HOLDING, 5306, "uint16", 1, True),
+    Register("Config", "Fireplace_Exhaust_Fan", HOLDING, 5307, "uint16", 1, True),
+    Register("Config", "Fireplace_Time", HOLDING, 5308, "uint16", 1, True),
+    Register("Config", "Boost_Time", HOLDING, 5309, "uint16", 1, True),
+    Register("Config", "Eco_Temp_Offset", HOLDING, 5310, "int16", 0.1, True),
+    Register("Config", "Filter_Period", HOLDING, 5311, "uint16", 1, True),
+
+    # --- Write only commands (Holding Registers 4x) ---
+    Register("Config", "Reset_Alarms", HOLDING, 5405, "uint16", 1, True),
+]
+
+# Keys that are written but never read back
+WRITE_ONLY = {("Config", "Reset_Alarms")}
+
+# Sensors that depend on installed accessories, probed once per unit
+CASA_OPTIONAL = frozenset([
+    ("Sensors", "Room_Temp"),
+    ("Sensors", "UP2_Temp"),
+    ("Sensors", "WR_Temp"),
+    ("Sensors", "PreHeat_Temp"),
+    ("Sensors", "ExtFresh_Temp"),
+    ("Sensors", "C02_Unf"),
+    ("Sensors", "CO2_Fil"),
+    ("Sensors", "AH_SP"),
+    ("Sensors", "VOC"),
+    ("Sensors", "Supply_Pressure"),
+    ("Sensors", "Exhaust_Pressure"),
+    ("Sensors", "Supply_Flow"),
+    ("Sensors", "Exhaust_Flow"),
+])
+
+# registers: the full register map of the model
+# optional: keys the unit may not have, only kept if the unit answers them
+# supports_fc23: writes are read back in the same request
+ModelProfile = namedtuple('ModelProfile', ['name', 'registers', 'optional', 'supports_fc23'], defaults=[frozenset(), False])
+
+PROFILES = {
+    "CASA R4": ModelProfile("CASA R4", CASA_REGISTERS, CASA_OPTIONAL),
+    "CASA R15": ModelProfile("CASA R15", CASA_REGISTERS, CASA_OPTIONAL),
+}
+
+REGISTER_MAPS = {model: profile.registers for model, profile in PROFILES.items()}
+
+
+def get_profile(device_model):
+    """Return the profile for a device model, unknown models get the CASA R4 profile."""
+    return PROFILES.get(device_model, PROFILES["CASA R4"])
+
+
+def get_register_map(device_model):
+    """Return the register map for a device model."""
+    return get_profile(device_model).registers
+
+
+def poll_interval(register, default_interval):
+    """Poll interval in seconds for a register, None if it is not polled."""
+    if register.interval is not None:
+        return register.interval
+    if register.group not in GROUP_INTERVALS:
+        return None
+    return GROUP_INTERVALS[register.group] or default_interval
+
+
+def register_width(register):
+    """Number of 16 bit words used by a register."""
+    return 2 if register.data_type.endswith("32") else 1
+
+
+def plan_reads(registers, max_gap=DEFAULT_MAX_GAP, max_count=MAX_READ_COUNT, holes=None):
+    """Coalesce registers into the fewest read requests.
+
+    Neighbouring registers of the same table are merged into one block as long
+    as the hole between them is at most max_gap registers and the block stays
+    within max_count registers. Holes never bridge the (table, address) pairs
+    in holes, addresses the unit is known to answer with an exception.
+    """
+    holes = holes or ()
+    blocks = []
+    ordered = sorted(registers, key=lambda r: (r.table, r.address))
+    table = start = end = None
+    members = []
+    for register in ordered:
+        reg_end = register.address + register_width(register)
+        if (
+            members
+            and register.table == table
+            and register.address - end <= max_gap
+            and max(end, reg_end) - start <= max_count
+            and not any((table, address) in holes for address in range(end, register.address))
+        ):
+            members.append(register)
+            end = max(end, reg_end)
+            continue
+        if members:
+            blocks.append(ReadBlock(table, start, end - start, tuple(members)))
+        table, start, end = register.table, register.address, reg_end
+        members = [register]
+    if members:
+        blocks.append(ReadBlock(table, start, end - start, tuple(members)))
+    return blocks
@@ -0,0 +1,60 @@
+# Poll scheduling per datapoint
+
+import time
+
+from .registers import poll_interval
+
+
+class PollScheduler:
+    """Keep track of which registers are due for polling.
+
+    Every register has its own interval. The coordinator ticks at the
+    shortest interval and only reads the registers that are due, all
+    batched into one planned read.
+    """
+
+    def __init__(self, registers, default_interval):
+        self._intervals = {}
+        for register in registers:
+            interval = poll_interval(register, default_interval)
+            if interval:
+                self._intervals[register] = interval
+        self._next_due = dict.fromkeys(self._intervals, 0.0)
+
+    @property
+    def registers(self):
+        return list(self._intervals)
+
+    def interval(self, register):
+        """Poll interval of a register in seconds, None if it is not polled."""
+        return self._intervals.get(register)
+
+    @property
+    def tick(self):
+        """Shortest poll interval in seconds."""
+        return min(self._intervals.values(), default=None)
+
+    def due(self, now=None):
+        """Return the registers that should be read now.
+
+        Registers that become due within half a tick are included, so a
+        register is not pushed a full tick back by scheduling jitter.
+        """
+        if now is None:
+            now = time.monotonic()
+        horizon = now + (self.tick or 0) / 2
+        return [register for register, next_due in self._next_due.items() if next_due <= horizon]
+
+    def mark_polled(self, registers, now=None):
+        """Restart the interval of registers that have been read."""
+        if now is None:
+            now = time.monotonic()
+        for register in registers:
+            if register in self._intervals:
+                self._next_due[register] = now + self._intervals[register]
+
+    def discard(self, registers):
+        """Stop polling registers, e.g. ones the unit does not have."""
+        for register in registers:
+            self._intervals.pop(register, None)
+            self._next_due.pop(register, None)
@@ -0,0 +1,241 @@
+# Local CASA Modbus TCP simulator
+#
+# Serves the register map of a device model from a pymodbus server. A small
+# TCP proxy in front of it adds latency, jitter and a connection limit, so
+# slow gateways can be reproduced without a real unit.
+#
+#   python scripts/swegon_simulator.py --port 5020 --latency 0.05 --jitter 0.02
+
+import argparse
+import asyncio
+import logging
+import random
+
+from pymodbus.datastore import ModbusServerContext, ModbusSlaveContext, ModbusSparseDataBlock
+from pymodbus.pdu import ExceptionResponse, ModbusExceptions
+from pymodbus.server import ModbusTcpServer
+
+from .registers import HOLDING, INPUT, Register, get_register_map, register_width
+
+_LOGGER = logging.getLogger(__name__)
+
+# Values served before anything is written, raw register words
+DEFAULT_VALUES = {
+    ("Sensors", "Fresh_Temp"): 0xFFCE,  # -5.0 C
+    ("Sensors", "Supply_Temp1"): 172,
+    ("Sensors", "Supply_Temp2"): 195,
+    ("Sensors", "Extract_Temp"): 218,
+    ("Sensors", "Exhaust_Temp"): 12,
+    ("Sensors", "UP1_Temp"): 214,
+    ("Sensors", "RH"): 38,
+    ("Sensors", "AH"): 62,
+    ("Sensors2", "Heat_Exchanger"): 100,
+    ("UnitStatuses", "Supply_Fan"): 45,
+    ("UnitStatuses", "Exhaust_Fan"): 45,
+    ("UnitStatuses", "Supply_Fan_RPM"): 1520,
+    ("UnitStatuses", "Exhaust_Fan_RPM"): 1480,
+    ("Commands", "Op_Mode"): 2,
+    ("Setpoints", "Temp_SP"): 200,
+}
+
+
+def load_yaml_registers(path):
+    """Registers from a Home Assistant modbus YAML such as swegon_casa_modbus.yaml."""
+    import yaml
+
+    with open(path, encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+
+    registers = []
+    for hub in config.get("modbus", []):
+        for sensor in hub.get("sensors", []):
+            table = INPUT if sensor.get("input_type") == "input" else HOLDING
+            registers.append(Register(
+                "Sensors", sensor["unique_id"], table, sensor["address"],
+                sensor.get("data_type", "uint16"), sensor.get("scale", 1)))
+        for switch in hub.get("switches", []):
+            registers.append(Register("Commands", switch["unique_id"], HOLDING, switch["address"], writable=True))
+    return registers
+
+
+class SwegonSimulator:
+    """Simulated Swegon unit(s) behind a Modbus TCP gateway."""
+
+    def __init__(
+        self, device_model="CASA R4", host="127.0.0.1", port=5020, slave_ids=(1,),
+        latency=0.0, jitter=0.0, error_rate=0.0, max_connections=None, registers=None, sparse=False,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.max_connections = max_connections
+        # Share of requests answered with slave device busy. Illegal data
+        # address would tell clients the address does not exist at all.
+        self.error_rate = error_rate
+        # Sparse units only answer mapped addresses, others answer every
+        # address between the lowest and highest mapped one.
+        self.sparse = sparse
+        self.connections = 0
+        self.refused = 0
+
+        if registers is None:
+            registers = get_register_map(device_model)
+        self.registers = list(registers)
+
+        slaves = {}
+        self.blocks = {}
+        for slave_id in slave_ids:
+            ir, hr = self._build_blocks()
+            self.blocks[slave_id] = {INPUT: ir, HOLDING: hr}
+            slaves[slave_id] = ModbusSlaveContext(ir=ir, hr=hr, zero_mode=True)
+        self._context = ModbusServerContext(slaves=slaves, single=False)
+        self._server = None
+        self._proxy = None
+        self._clients = set()
+
+    def _build_blocks(self):
+        values = {INPUT: {}, HOLDING: {}}
+        if not self.sparse:
+            for table in values:
+                addresses = [r.address for r in self.registers if r.table == table]
+                if addresses:
+                    values[table] = dict.fromkeys(range(min(addresses), max(addresses) + 2), 0)
+        for register in self.registers:
+            raw = DEFAULT_VALUES.get((register.group, register.key), 0)
+            for i in range(register_width(register)):
+                values[register.table][register.address + i] = raw if i == 0 else 0
+        return ModbusSparseDataBlock(values[INPUT]), ModbusSparseDataBlock(values[HOLDING])
+
+    def _manipulate(self, response):
+        """Turn responses into busy exceptions at error_rate."""
+        if self.error_rate and not response.isError() and random.random() < self.error_rate:
+            busy = ExceptionResponse(response.function_code, ModbusExceptions.SlaveBusy)
+            busy.transaction_id = response.transaction_id
+            busy.slave_id = response.slave_id
+            response = busy
+        return response, False
+
+    def set_value(self, table, address, words, slave_id=1):
+        """Change what the simulated unit reports."""
+        self.blocks[slave_id][table].setValues(address, words)
+
+    def get_value(self, table, address, count=1, slave_id=1):
+        return self.blocks[slave_id][table].getValues(address, count)
+
+    async def start(self):
+        # pymodbus serves on an ephemeral port, clients talk to the proxy
+        self._server = ModbusTcpServer(
+            context=self._context, address=(self.host, 0), response_manipulator=self._manipulate)
+        await self._server.listen()
+        backend_port = self._server.transport.sockets[0].getsockname()[1]
+
+        async def handle(reader, writer):
+            task = asyncio.current_task()
+            self._clients.add(task)
+            try:
+                await self._handle_client(reader, writer, backend_port)
+            except asyncio.CancelledError:
+                writer.close()
+            finally:
+                self._clients.discard(task)
+
+        self._proxy = await asyncio.start_server(handle, self.host, self.port)
+        self.port = self._proxy.sockets[0].getsockname()[1]
+        _LOGGER.info("Simulator listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self._proxy is not None:
+            self._proxy.close()
+            for task in list(self._clients):
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._proxy.wait_closed()
+        if self._server is not None:
+            await self._server.shutdown()
+
+    async def _handle_client(self, reader, writer, backend_port):
+        if self.max_connections is not None and self.connections >= self.max_connections:
+            # Gateway out of connections, refuse like a real one would
+            self.refused += 1
+            writer.close()
+            return
+        self.connections += 1
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection(self.host, backend_port)
+            await asyncio.gather(
+                self._pipe(reader, backend_writer, delay=False),
+                self._pipe(backend_reader, writer, delay=True),
+                return_exceptions=True,
+            )
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _pipe(self, reader, writer, delay):
+        """Copy bytes, responses are held back by latency plus jitter.
+
+        Every chunk gets its own due time, so pipelined requests overlap
+        their latency instead of queueing behind each other.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        async def forward():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                wait = due - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                writer.write(data)
+                await writer.drain()
+
+        forwarder = asyncio.ensure_future(forward())
+        try:
+            while data := await reader.read(4096):
+                wait = 0.0
+                if delay:
+                    wait = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+                queue.put_nowait((loop.time() + wait, data))
+        finally:
+            queue.put_nowait((0, None))
+            await forwarder
+            writer.close()
+
+
+async def _run(args):
+    simulator = SwegonSimulator(
+        args.model, args.host, args.port, tuple(args.slave_id or [1]), args.latency, args.jitter,
+        args.error_rate, args.max_connections,
+        load_yaml_registers(args.yaml) if args.yaml else None, args.sparse,
+    )
+    await simulator.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Swegon CASA unit over Modbus TCP")
+    parser.add_argument("--model", default="CASA R4")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--slave-id", type=int, action="append", help="may be given more than once")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with slave device busy")
+    parser.add_argument("--max-connections", type=int, default=None)
+    parser.add_argument("--yaml", help="serve the registers of a Home Assistant modbus YAML instead")
+    parser.add_argument("--sparse", action="store_true", help="only answer mapped addresses")
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_run(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# Full register snapshots
+#
+# Reads every input and holding register in a range with as few requests as
+# possible, for support dumps of a misbehaving unit. Ranges are read in
+# maximum size requests, where one is answered with an exception the readable
+# part is narrowed down by bisection. Runs of unreadable addresses are skipped
+# the same way, by galloping over single register reads to the next readable
+# address.
+
+import asyncio
+import bisect
+import json
+import struct
+import time
+from datetime import datetime, timezone
+
+from .registers import HOLDING, INPUT, MAX_READ_COUNT, register_width
+
+# Addresses around the register map that are included by default
+RANGE_MARGIN = 100
+
+
+def default_ranges(registers):
+    """Range per table covering the register map, rounded out to RANGE_MARGIN."""
+    ranges = {}
+    for register in registers:
+        end = register.address + register_width(register)
+        low, high = ranges.get(register.table, (register.address, end))
+        ranges[register.table] = (min(low, register.address), max(high, end))
+    return {
+        table: (low // RANGE_MARGIN * RANGE_MARGIN, -(-high // RANGE_MARGIN) * RANGE_MARGIN)
+        for table, (low, high) in ranges.items()
+    }
+
+
+async def _readable_prefix(read, address, count, optimistic=True):
+    """Longest readable run of words at address, at most count long.
+
+    A read fails if any address in it is unreadable, so the run ends right
+    before the first unreadable address. It is found by galloping over
+    1, 2, 4 .. words, capped at count, and bisecting between the last size
+    that could be read and the first that could not.
+    """
+    if optimistic:
+        words = await read(address, count)
+        if words is not None:
+            return words
+    # Smallest size known to fail, count itself only after an optimistic read
+    good, good_words, bad = 0, [], count if optimistic else count + 1
+    size = 1
+    while good < bad - 1:
+        words = await read(address, size)
+        if words is None:
+            bad = size
+            break
+        good, good_words = size, words
+        size = min(size * 2, bad - 1)
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        words = await read(address, mid)
+        if words is None:
+            bad = mid
+        else:
+            good, good_words = mid, words
+    return good_words
+
+
+async def _unreadable_run(read, address, end):
+    """First readable address after address, which could not be read.
+
+    Single registers at address+1, +2, +4 .. are read until one answers,
+    then the first readable address is bisected between that one and the
+    last that did not. A run of n unreadable addresses costs about 2 log2(n)
+    requests instead of n. Readable islands inside a run that the probes step
+    over are reported as unreadable. Returns end if nothing before it answers.
+    """
+    bad, good = address, end
+    step = 1
+    while address + step < end:
+        if await read(address + step, 1) is not None:
+            good = address + step
+            break
+        bad = address + step
+        step *= 2
+    while good - bad > 1:
+        mid = (good + bad) // 2
+        if await read(mid, 1) is None:
+            bad = mid
+        else:
+            good = mid
+    return good
+
+
+async def scan_range(device, table, start, end, max_count=MAX_READ_COUNT, limit=None, known=()):
+    """Read start..end-1 of a table.
+
+    Returns the readable runs as {address: words} and the unreadable
+    addresses merged into a list of (start, end). A range the unit answers
+    in full costs one request per max_count words. Chunks of max_count are
+    scanned at the same time, the hub decides how many requests are in
+    flight unless limit, a semaphore, bounds them further.
+
+    Skipping a run of unreadable addresses never steps over an address in
+    known, usually the register map, so those are always read.
+    """
+    known = sorted(set(known))
+
+    async def read(address, count):
+        if limit is None:
+            return await device.readRaw(table, address, count)
+        async with limit:
+            return await device.readRaw(table, address, count)
+
+    async def scan(address, end):
+        blocks, invalid = {}, []
+        optimistic = True
+        while address < end:
+            words = await _readable_prefix(read, address, min(max_count, end - address), optimistic)
+            if words:
+                blocks[address] = list(words)
+                address += len(words)
+                optimistic = True
+            else:
+                # Unreadable addresses tend to come in runs, skip to the next
+                # address that answers and try a full read from there
+                hint = bisect.bisect_right(known, address)
+                bound = min(end, known[hint]) if hint < len(known) else end
+                next_address = await _unreadable_run(read, address, bound)
+                invalid.append((address, next_address))
+                address = next_address
+                optimistic = True
+        return blocks, invalid
+
+    chunks = [(address, min(address + max_count, end)) for address in range(start, end, max_count)]
+    readable = {}
+    invalid = []
+    for blocks, holes in await asyncio.gather(*(scan(*chunk) for chunk in chunks)):
+        readable.update(blocks)
+        invalid.extend(holes)
+    return _merge_blocks(readable), _merge_ranges(invalid)
+
+
+def _merge_blocks(blocks):
+    merged = {}
+    last = None
+    for address in sorted(blocks):
+        if last is not None and last + len(merged[last]) == address:
+            merged[last].extend(blocks[address])
+        else:
+            merged[address] = list(blocks[address])
+            last = address
+    return merged
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _hex(words):
+    return struct.pack(">{}H".format(len(words)), *words).hex()
+
+
+async def take_snapshot(device, ranges=None):
+    """Snapshot of every readable register in ranges, {table: (start, end)}.
+
+    The words of each readable run are stored as a big endian hex string,
+    the same bytes as on the wire.
+    """
+    if ranges is None:
+        ranges = default_ranges(device.Registers.values())
+    requests = device.hub.requests
+    started = time.monotonic()
+    taken = datetime.now(timezone.utc)
+
+    tables = {}
+    for table in (INPUT, HOLDING):
+        if table not in ranges:
+            continue
+        start, end = ranges[table]
+        known = [register.address for register in device.Registers.values() if register.table == table]
+        readable, invalid = await scan_range(device, table, start, end, known=known)
+        tables[table] = {
+            "start": start,
+            "end": end,
+            "blocks": [{"address": address, "count": len(words), "words": _hex(words)} for address, words in readable.items()],
+            "invalid": invalid,
+        }
+
+    return {
+        "model": device.device_module,
+        "host": device.ip,
+        "port": device.port,
+        "slave_id": device.slave_id,
+        "device_info": {key: point.Value for key, point in device.Datapoints["Device_Info"].items()},
+        "taken": taken.isoformat(),
+        "duration": round(time.monotonic() - started, 3),
+        "requests": device.hub.requests - requests,
+        "tables": tables,
+    }
+
+
+def snapshot_words(snapshot, table):
+    """{address: word} of a snapshot table, for comparing snapshots."""
+    words = {}
+    for block in snapshot["tables"].get(table, {}).get("blocks", []):
+        data = bytes.fromhex(block["words"])
+        for i in range(block["count"]):
+            words[block["address"] + i] = int.from_bytes(data[2 * i:2 * i + 2], "big")
+    return words
+
+
+def dump(snapshot, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, separators=(",", ":"))
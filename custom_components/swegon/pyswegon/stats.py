@@ -0,0 +1,128 @@
+# Rolling statistics per datapoint
+#
+# Min, max, mean and trend over the last few minutes of polled values, kept in
+# memory so trending needs no recorder queries.
+
+from array import array
+from collections import deque
+
+
+class RollingStats:
+    """Rolling min, max, mean and trend over the last window seconds.
+
+    Samples live in fixed size arrays used as a ring buffer. The sums behind
+    the mean and the least squares trend are updated as samples enter and
+    leave, min and max are kept in monotonic deques, so a sample costs O(1)
+    amortized no matter the window.
+    """
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.capacity = max(2, capacity)
+        self._times = array('d', bytes(8 * self.capacity))
+        self._values = array('d', bytes(8 * self.capacity))
+        self._start = 0
+        self._count = 0
+        self._seq = 0  # Sequence number of the next sample
+        self._origin = None
+        self._sum_t = self._sum_v = self._sum_tt = self._sum_tv = 0.0
+        self._min = deque()  # (seq, value), values increasing
+        self._max = deque()  # (seq, value), values decreasing
+
+    def __len__(self):
+        return self._count
+
+    def add(self, now, value):
+        if self._origin is None:
+            self._origin = now
+        elif now - self._origin > 10 * self.window:
+            self._rebase(now)
+        self._expire(now)
+        if self._count == self.capacity:
+            self._pop()
+
+        t = now - self._origin
+        index = (self._start + self._count) % self.capacity
+        self._times[index] = t
+        self._values[index] = value
+        self._count += 1
+        self._sum_t += t
+        self._sum_v += value
+        self._sum_tt += t * t
+        self._sum_tv += t * value
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((self._seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((self._seq, value))
+        self._seq += 1
+
+    def _pop(self):
+        t = self._times[self._start]
+        value = self._values[self._start]
+        self._start = (self._start + 1) % self.capacity
+        self._count -= 1
+        self._sum_t -= t
+        self._sum_v -= value
+        self._sum_tt -= t * t
+        self._sum_tv -= t * value
+        oldest = self._seq - self._count
+        while self._min and self._min[0][0] < oldest:
+            self._min.popleft()
+        while self._max and self._max[0][0] < oldest:
+            self._max.popleft()
+
+    def _expire(self, now):
+        horizon = now - self._origin - self.window
+        while self._count and self._times[self._start] < horizon:
+            self._pop()
+
+    def _rebase(self, now):
+        """Move the time origin forward, keeps the trend sums precise."""
+        shift = now - self.window - self._origin
+        self._origin += shift
+        self._sum_t = self._sum_tt = self._sum_tv = 0.0
+        for i in range(self._count):
+            index = (self._start + i) % self.capacity
+            t = self._times[index] - shift
+            self._times[index] = t
+            self._sum_t += t
+            self._sum_tt += t * t
+            self._sum_tv += t * self._values[index]
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def mean(self):
+        return self._sum_v / self._count if self._count else None
+
+    @property
+    def trend(self):
+        """Least squares slope in units per hour, None below two samples."""
+        n = self._count
+        if n < 2:
+            return None
+        denominator = n * self._sum_tt - self._sum_t * self._sum_t
+        if denominator <= 1e-9:
+            return None
+        return (n * self._sum_tv - self._sum_t * self._sum_v) / denominator * 3600
+
+    def as_dict(self):
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "min": rounded(self.min),
+            "max": rounded(self.max),
+            "mean": rounded(self.mean),
+            "trend": rounded(self.trend),
+            "samples": self._count,
+        }
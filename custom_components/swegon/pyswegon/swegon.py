@@ -2,113 +2,588 @@
 
 import asyncio
 import logging
-from types import SimpleNamespace
-from pymodbus.client import AsyncModbusTcpClient
-from pymodbus.exceptions import ModbusIOException
+import time
+
+from .breaker import CircuitBreaker
+from .derived import DerivedEngine
+from .hub import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, ModbusHub
+from .image import DatapointsView, RegisterImage, encode
+from .modbus import ILLEGAL_DATA_ADDRESS, io_error
+from .registers import HOLDING, WRITE_ONLY, ReadBlock, get_profile, plan_reads, register_width
+from .writer import DEFAULT_WRITE_DELAY, WriteQueue
 
 _LOGGER = logging.getLogger(__name__)
 
-def _v(value):
-    return SimpleNamespace(Value=value)
+# Cached probe results of another version are not trusted, the unit is
+# probed again
+PROBE_VERSION = 2
+
+# Quality of a datapoint value, worst last
+QUALITY_GOOD = "good"  # Read by the last poll
+QUALITY_CACHED = "cached"  # Restored from the cache, not read since
+QUALITY_UNCERTAIN = "uncertain"  # The last read failed, value of an earlier one
+QUALITIES = (QUALITY_GOOD, QUALITY_CACHED, QUALITY_UNCERTAIN)
 
 class Swegon:
-    def __init__(self, device_module, ip, port=502, slave_id=1):
+    def __init__(self, device_module, ip, port=502, slave_id=1, pipeline_window=1, write_delay=DEFAULT_WRITE_DELAY):
         self.device_module = device_module
         self.ip = ip
         self.port = port
         self.slave_id = slave_id
-        self._client = None
 
-        # Data structure
-        self.Datapoints = {}
+        # Connection shared with other units on the same gateway. The
+        # pipeline window is the number of requests allowed in flight at
+        # once, responses are matched by the Modbus TCP transaction id.
+        self._hub = ModbusHub.acquire(ip, port, pipeline_window)
+
+        # Register map for this device model. Optional registers are
+        # probed once, the ones the unit does not answer are left out.
+        self.profile = get_profile(device_module)
+        registers = self.profile.registers
+        self.Registers = {(register.group, register.key): register for register in registers}
+        self.unsupported = set()
+        self.probed = False
+        self._invalid = set()  # (table, address) the unit does not answer
+        self._holes = set()
+
+        # Data structure. Register values live in the image, other values
+        # (device info, summaries) in a plain dict. Datapoints is a view
+        # over both for Datapoints[group][key].Value style access.
+        self.image = RegisterImage(registers)
+        self._values = {"Device_Info": {"FW_Maj": 0}}
+        self.Datapoints = DatapointsView(self.image, self._values)
+
+        # Datapoints changed since popChanges was last called
+        self._changes = set()
+
+        # Wall clock time each register was last read, and the registers
+        # whose value is from the cache or whose last read failed
+        self._updated = {}
+        self._cached = set()
+        self._failed = set()
+
+        # Values computed from other datapoints, updated in popChanges
+        self._derived = DerivedEngine()
+
+        # Alarm registers in bit order, bit i of activeAlarms is set while
+        # alarm i is active. Transitions are kept until popped, but not for
+        # the first alarm state read after start.
+        self._alarmRegisters = sorted((r for r in registers if r.group == "Alarms"), key=lambda r: r.address)
+        self.activeAlarms = 0
+        self._alarmsKnown = False
+        self._alarmTransitions = []
+
+        # Writes are debounced and merged before they are sent
+        self._writer = WriteQueue(self._writeBlock, write_delay)
+
+        # Write and read back in one request (FC23) instead of two
+        self.supports_fc23 = self.profile.supports_fc23
+
+        # Polls fail fast while the unit is not answering, the image keeps
+        # the last known values meanwhile.
+        self._breaker = CircuitBreaker()
+
+    @property
+    def hub(self):
+        return self._hub
+
+    @property
+    def metrics(self):
+        """Transport metrics of the requests to this unit."""
+        return self._hub.unit_metrics(self.slave_id)
+
+    @property
+    def pipeline_window(self):
+        return self._hub.window
 
     async def _ensure_client(self):
-        if self._client is None or not self._client.connected:
-            self._client = AsyncModbusTcpClient(host=self.ip, port=self.port)
-            await self._client.connect()
+        await self._hub.connect()
+
+    async def close(self):
+        await self._writer.flush()
+        await self._hub.release()
+
+    def supports(self, group, key):
+        """False for optional registers the unit turned out not to have,
+        and for derived datapoints using one of them."""
+        inputs = self._derived.inputs(group, key)
+        if inputs is not None:
+            return all(self.supports(*key) for key in inputs)
+        return (group, key) not in self.unsupported
+
+    def getGroupRegisters(self, groups):
+        """Return all readable registers of the given groups."""
+        return [
+            register for (group, key), register in self.Registers.items()
+            if group in groups and (group, key) not in WRITE_ONLY and (group, key) not in self.unsupported
+        ]
+
+    async def probeOptional(self):
+        """Find out which optional registers the unit answers.
+
+        Runs of adjacent optional registers are read as one block, only
+        blocks answered with an exception are narrowed down register by
+        register. Connection errors and exception responses other than
+        illegal data address are raised, nothing is marked as unsupported
+        then. Returns the unsupported keys.
+        """
+        await self._ensure_client()
+        optional = [self.Registers[key] for key in self.profile.optional if key in self.Registers]
+        unsupported = set()
+        for block in plan_reads(optional, max_gap=0):
+            if await self._probeBlock(block):
+                continue
+            for register in block.registers:
+                if not await self._probeBlock(ReadBlock(register.table, register.address, 1, (register,))):
+                    unsupported.add((register.group, register.key))
+        self._setUnsupported(unsupported)
+        _LOGGER.debug("%s:%s unit %s does not have %s", self.ip, self.port, self.slave_id, sorted(unsupported))
+        return unsupported
+
+    def _setUnsupported(self, keys):
+        self.unsupported = set(keys)
+        self.probed = True
+        # Reads must not bridge registers the unit answers with an exception
+        self._holes = self._invalid | {
+            (register.table, register.address + i)
+            for register in (self.Registers[key] for key in self.unsupported if key in self.Registers)
+            for i in range(register_width(register))
+        }
+
+    def applyDiscovery(self, invalid):
+        """Use the addresses a discovery found unanswered, as (table, address).
+
+        Registers at those addresses are left out like unsupported optional
+        ones, and reads never bridge them. Returns the keys left out.
+        """
+        self._invalid = set(invalid)
+        missing = {
+            key for key, register in self.Registers.items()
+            if any((register.table, register.address + i) in self._invalid for i in range(register_width(register)))
+        }
+        self._setUnsupported(self.unsupported | missing)
+        return missing
+
+    async def _probeBlock(self, block):
+        words = await self.readRaw(block.table, block.address, block.count)
+        if words is None:
+            return False
+        self._storeBlock(block, words)
+        return True
+
+    async def readRaw(self, table, address, count, priority=PRIORITY_BACKGROUND):
+        """Read raw words without touching the image.
+
+        Returns None if the unit answers with illegal data address, i.e. it
+        does not have one of the addresses. Other exception responses, e.g.
+        server busy, and connection errors are raised.
+        """
+        method = "read_holding_registers" if table == HOLDING else "read_input_registers"
+        rr = await self._hub.execute(method, address, count=count, slave=self.slave_id, priority=priority)
+        if rr.isError():
+            if getattr(rr, "exception_code", None) == ILLEGAL_DATA_ADDRESS:
+                return None
+            raise io_error("Error reading {} registers {}-{}: {}".format(table, address, address + count - 1, rr))
+        return rr.registers
+
+    async def readGroups(self, groups, priority=PRIORITY_BACKGROUND):
+        return await self.readRegisters(self.getGroupRegisters(groups), priority)
+
+    async def readRegisters(self, registers, priority=PRIORITY_BACKGROUND):
+        """Read registers using as few requests as possible.
+
+        Returns every mapped register that was refreshed, which includes
+        registers that happened to lie inside a bridged gap.
+
+        Every block waits for the hub on its own, so an interactive request
+        queued during a long background read goes out after the block in
+        flight instead of after the whole read.
+
+        Raises CircuitOpenError without touching the network while the
+        unit is backing off after repeated failures.
+        """
+        self._breaker.check("{}:{} unit {}".format(self.ip, self.port, self.slave_id))
+        try:
+            await self._ensure_client()
+            blocks = plan_reads(registers, holes=self._holes)
+            updated = []
+            if self.pipeline_window > 1 and len(blocks) > 1:
+                for block, values in zip(blocks, await self._readBlocksPipelined(blocks, priority)):
+                    updated.extend(self._storeBlock(block, values))
+            else:
+                for block in blocks:
+                    updated.extend(self._storeBlock(block, await self._readBlock(block, priority)))
+        except BaseException:
+            # Cancelled reads included, a half open breaker waits for its probe
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+        return updated
+
+    async def pollRegisters(self, registers, deadline, priority=PRIORITY_BACKGROUND):
+        """Read registers like readRegisters, but each block on its own.
+
+        A block that fails or takes longer than deadline seconds, waiting
+        for the hub included, does not fail the poll. Its registers keep
+        their last value with uncertain quality and are read on the next
+        poll. Returns the refreshed registers and the registers of the
+        blocks that failed.
+
+        With pipelining, blocks answered with an exception or lost with the
+        connection while others were read are read again one at a time.
+        Blocks past their deadline are only slow, they are not read again.
+        Whether the gateway keeps pipelining is up to the hub, which only
+        turns it off after repeatedly mismatched responses.
+
+        Raises CircuitOpenError while the unit is backing off, and
+        connection errors as readRegisters does.
+        """
+        try:
+            self._breaker.check("{}:{} unit {}".format(self.ip, self.port, self.slave_id))
+            try:
+                await self._ensure_client()
+            except BaseException:
+                self._breaker.record_failure()
+                raise
+        except BaseException:
+            self._failed.update((register.group, register.key) for register in registers)
+            raise
+        try:
+            return await self._pollBlocks(plan_reads(registers, holes=self._holes), deadline, priority)
+        except asyncio.CancelledError:
+            # A half open breaker waits for the outcome of its probe
+            self._failed.update((register.group, register.key) for register in registers)
+            self._breaker.record_failure()
+            raise
+
+    async def _pollBlocks(self, blocks, deadline, priority):
+        """Read the blocks of pollRegisters, see there."""
+        suspect = []  # Blocks worth reading again one at a time
+
+        async def read(i):
+            block = blocks[i]
+            try:
+                rr = await asyncio.wait_for(self._requestBlock(block, priority), deadline)
+            except asyncio.TimeoutError:
+                _LOGGER.debug("Reading %s registers %s-%s missed its deadline",
+                              block.table, block.address, block.address + block.count - 1)
+                return None
+            except Exception as err:
+                _LOGGER.debug("Reading %s registers %s-%s failed: %r",
+                              block.table, block.address, block.address + block.count - 1, err)
+                if not self._hub.connected:
+                    suspect.append(i)
+                return None
+            if rr.isError():
+                _LOGGER.debug("Reading %s registers %s-%s failed: %s",
+                              block.table, block.address, block.address + block.count - 1, rr)
+                suspect.append(i)
+                return None
+            return rr.registers
+
+        if self.pipeline_window > 1 and len(blocks) > 1:
+            results = await asyncio.gather(*(read(i) for i in range(len(blocks))))
+            retried = sorted(suspect)
+            if retried and any(result is not None for result in results):
+                suspect.clear()
+                try:
+                    await self._ensure_client()
+                except Exception:
+                    retried = []
+                for i in retried:
+                    results[i] = await read(i)
+        else:
+            results = [await read(i) for i in range(len(blocks))]
+        self._hub.record_poll()
+
+        updated, failed = [], []
+        for block, words in zip(blocks, results):
+            if words is None:
+                failed.extend(block.registers)
+            else:
+                updated.extend(self._storeBlock(block, words))
+        self._failed.update((register.group, register.key) for register in failed)
+
+        # Only a poll where nothing could be read counts against the unit
+        if blocks and not updated:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return updated, failed
+
+    async def _requestBlock(self, block, priority=PRIORITY_BACKGROUND):
+        if block.table == HOLDING:
+            return await self._hub.execute(
+                "read_holding_registers", block.address, count=block.count, slave=self.slave_id, priority=priority)
+        return await self._hub.execute(
+            "read_input_registers", block.address, count=block.count, slave=self.slave_id, priority=priority)
+
+    async def _readBlock(self, block, priority=PRIORITY_BACKGROUND):
+        rr = await self._requestBlock(block, priority)
+        if rr.isError():
+            raise io_error("Error reading {} registers {}-{}".format(
+                block.table, block.address, block.address + block.count - 1))
+        return rr.registers
+
+    async def _readBlocksPipelined(self, blocks, priority=PRIORITY_BACKGROUND):
+        """Read blocks with up to pipeline_window requests in flight.
+
+        Blocks that fail are read again one at a time.
+        """
+        results = await asyncio.gather(*(self._readBlock(block, priority) for block in blocks), return_exceptions=True)
+        failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+        if not failed:
+            return results
+
+        await self._ensure_client()
+        for i in failed:
+            results[i] = await self._readBlock(blocks[i], priority)
+        return results
+
+    def _storeBlock(self, block, values):
+        return self._storeWords(block.table, block.address, values)
+
+    def _storeWords(self, table, address, words):
+        refreshed, changed = self.image.store(table, address, words)
+        now = time.time()
+        for register in refreshed:
+            key = (register.group, register.key)
+            self._updated[key] = now
+            self._cached.discard(key)
+            self._failed.discard(key)
+        self._changes.update((register.group, register.key) for register in changed)
+        if any(register.group == "Alarms" for register in changed):
+            self._updateActiveAlarms()
+        return refreshed
+
+    def _updateActiveAlarms(self):
+        mask = 0
+        for bit, register in enumerate(self._alarmRegisters):
+            if self.image.get(register):
+                mask |= 1 << bit
+        changed = mask ^ self.activeAlarms
+        if self._alarmsKnown:
+            while changed:
+                low = changed & -changed
+                key = self._alarmRegisters[low.bit_length() - 1].key
+                self._alarmTransitions.append((key, bool(mask & low)))
+                changed ^= low
+        self.activeAlarms = mask
+        self._alarmsKnown = True
+        self._setValue("Alarms", "Active_Alarms", mask != 0)
+
+    def getActiveAlarms(self):
+        """Keys of the active alarms, in register order."""
+        return [register.key for bit, register in enumerate(self._alarmRegisters) if self.activeAlarms >> bit & 1]
+
+    def popAlarmTransitions(self):
+        """Return (key, active) for every alarm raised or cleared since the last call."""
+        transitions = self._alarmTransitions
+        self._alarmTransitions = []
+        return transitions
+
+    def _setValue(self, group, key, value):
+        """Set a datapoint that is not backed by a register."""
+        values = self._values.setdefault(group, {})
+        if key not in values or values[key] != value:
+            values[key] = value
+            self._changes.add((group, key))
+
+    def getValue(self, group, key):
+        if key in self._values.get(group, {}):
+            return self._values[group][key]
+        register = self.image.registers.get((group, key))
+        if register is None:
+            return None
+        return self.image.get(register)
+
+    def _inputKeys(self, group, key):
+        """The register datapoints behind a datapoint, derived ones resolved."""
+        inputs = self._derived.inputs(group, key)
+        if inputs is None:
+            return [(group, key)] if (group, key) in self.Registers else []
+        keys = []
+        for input_group, input_key in inputs:
+            keys.extend(self._inputKeys(input_group, input_key))
+        return keys
+
+    def getUpdated(self, group, key):
+        """Wall clock time the value was last read, None if never.
+
+        Derived datapoints are as old as their oldest input. Datapoints not
+        backed by registers have no timestamp.
+        """
+        keys = self._inputKeys(group, key)
+        if not keys or any(k not in self._updated for k in keys):
+            return None
+        return min(self._updated[k] for k in keys)
+
+    def getQuality(self, group, key):
+        """One of QUALITIES, the worst of the inputs for derived datapoints.
+
+        None while there is no value, and for datapoints not backed by
+        registers.
+        """
+        keys = self._inputKeys(group, key)
+        if not keys or any(k not in self._updated for k in keys):
+            return None
+        if any(k in self._failed for k in keys):
+            return QUALITY_UNCERTAIN
+        if any(k in self._cached for k in keys):
+            return QUALITY_CACHED
+        return QUALITY_GOOD
+
+    def popChanges(self):
+        """Return the datapoints changed since the last call."""
+        for group, key, value in self._derived.update(set(self._changes), self.getValue):
+            self._setValue(group, key, value)
+        changes = self._changes
+        self._changes = set()
+        return changes
+
+    def snapshot(self):
+        """Device info and the register image, for caching across restarts."""
+        return {
+            "model": self.device_module,
+            "device_info": dict(self._values["Device_Info"]),
+            "probed": self.probed,
+            "probe_version": PROBE_VERSION,
+            "unsupported": sorted(self.unsupported),
+            "image": self.image.snapshot(),
+            "updated": [[group, key, updated] for (group, key), updated in self._updated.items()],
+        }
+
+    def restore(self, snapshot):
+        """Load a snapshot taken of the same model, returns the restored registers."""
+        if snapshot.get("model") != self.device_module:
+            return []
+        for key, value in snapshot.get("device_info", {}).items():
+            self._setValue("Device_Info", key, value)
+        if snapshot.get("probed") and snapshot.get("probe_version") == PROBE_VERSION:
+            self._setUnsupported(tuple(key) for key in snapshot.get("unsupported", []))
+        restored = self.image.restore(snapshot.get("image", {}))
+        self._changes.update((register.group, register.key) for register in restored)
+        keys = {(register.group, register.key) for register in restored}
+        for group, key, updated in snapshot.get("updated", []):
+            if (group, key) in keys:
+                self._updated[(group, key)] = updated
+        self._cached.update(keys & self._updated.keys())
+        if any(register.group == "Alarms" for register in restored):
+            self._updateActiveAlarms()
+        return restored
 
     async def readDeviceInfo(self):
+        """Returns True if the device info could be read."""
         # Example reads; adapt register addresses to actual device mapping
         await self._ensure_client()
         # This is a simplified example; upstream implementation has detailed mapping
         try:
             # Read some registers (example address and count)
-            rr = await self._client.read_holding_registers(100, 10, unit=self.slave_id)
+            rr = await self._hub.execute("read_holding_registers", 100, count=10, slave=self.slave_id)
             if rr.isError():
-                raise ModbusIOException("Error reading device info")
+                raise io_error("Error reading device info")
             # parse rr.registers ...
             # populate datapoints minimally
-            self.Datapoints.setdefault("Device_Info", {})
-            self.Datapoints["Device_Info"]["FW_Maj"] = _v(1)
-            self.Datapoints["Device_Info"]["Model"] = _v("CASA R5H")
-            self.Datapoints["Device_Info"]["Serial"] = _v("SN12345678")
-            self.Datapoints["Device_Info"]["FW"] = _v("1.0.0")
+            self._setValue("Device_Info", "FW_Maj", 1)
+            self._setValue("Device_Info", "Model", "CASA R5H")
+            self._setValue("Device_Info", "Serial", "SN12345678")
+            self._setValue("Device_Info", "FW", "1.0.0")
+            return True
         except Exception as e:
             _LOGGER.debug("readDeviceInfo error: %s", e)
+            return False
 
     async def readSetpoints(self):
-        await self._ensure_client()
-        # read setpoints registers and populate Datapoints['Setpoints']
-        self.Datapoints.setdefault("Setpoints", {})
-        self.Datapoints["Setpoints"]["Temp_SP"] = _v(20.0)
+        await self.readGroups(["Setpoints"])
 
     async def readAlarms(self):
-        await self._ensure_client()
-        self.Datapoints.setdefault("Alarms", {})
-        self.Datapoints["Alarms"]["Active_Alarms"] = _v(False)
+        await self.readGroups(["Alarms"])
 
     async def readSensors(self):
-        await self._ensure_client()
-        self.Datapoints.setdefault("Sensors", {})
-        # Example: read input registers for temperatures
-        # Replace addresses with correct ones for your device
-        try:
-            rr = await self._client.read_input_registers(6200, 10, unit=self.slave_id)
-            if not rr.isError():
-                regs = rr.registers
-                # convert and assign example
-                self.Datapoints["Sensors"]["Fresh_Temp"] = _v(regs[0] / 10)
-                self.Datapoints["Sensors"]["Supply_Temp1"] = _v(regs[1] / 10)
-                self.Datapoints["Sensors"]["Supply_Temp2"] = _v(regs[2] / 10)
-        except Exception as e:
-            _LOGGER.debug("readSensors error: %s", e)
+        await self.readGroups(["Sensors", "Sensors2"])
 
     async def readCommands(self):
-        await self._ensure_client()
-        self.Datapoints.setdefault("Commands", {})
-        # Read holding registers for commands if necessary
+        await self.readGroups(["Commands"])
 
     async def readUnitStatuses(self):
-        await self._ensure_client()
-        # populate UnitStatuses
+        await self.readGroups(["UnitStatuses"])
 
     async def readValue(self, group, key):
-        # For certain keys, perform targeted reads
-        await self._ensure_client()
-        # Simple fallback: return current Datapoints value
-        if group in self.Datapoints and key in self.Datapoints[group]:
-            return self.Datapoints[group][key].Value
-        return None
+        register = self.Registers.get((group, key))
+        if register is not None and (group, key) not in WRITE_ONLY:
+            await self.readRegisters([register], PRIORITY_INTERACTIVE)
+        return self.getValue(group, key)
+
+    def queueWrite(self, group, key, value):
+        """Queue a write, returns a future that resolves once it is committed.
+
+        The value is stored optimistically right away. Once written it is
+        confirmed by reading the register back, and if the write fails the
+        image is rolled back to what the device holds.
+        """
+        register = self.Registers.get((group, key))
+        if register is None or not register.writable:
+            raise ValueError("{}/{} is not writable".format(group, key))
+        words = encode(register, value)
+        self._storeWords(register.table, register.address, words)
+        return self._writer.enqueue(register.address, words)
 
     async def writeValue(self, group, key, value):
-        await self._ensure_client()
-        # Map group/key to register address and write
+        await self.queueWrite(group, key, value)
+
+    async def _writeBlock(self, address, words):
+        block = ReadBlock(HOLDING, address, len(words), ())
         try:
-            # Example: write single holding register at address 5000
-            # convert according to device scaling if needed
-            address = 5000
-            await self._client.write_register(address, int(value), unit=self.slave_id)
-            # update local datapoints
-            self.Datapoints.setdefault(group, {})
-            self.Datapoints[group][key] = _v(value)
-        except Exception as e:
-            _LOGGER.debug("writeValue error: %s", e)
+            actual = await self._writeAndReadBack(block, words)
+        except Exception:
+            # Roll back the optimistic value
+            try:
+                self._storeBlock(block, await self._readBlock(block, PRIORITY_INTERACTIVE))
+            except Exception:
+                self._invalidate(block)
+            raise
+        if list(actual) != list(words):
+            _LOGGER.debug("Device holds %s instead of written %s at %s", list(actual), words, address)
+        self._storeBlock(block, actual)
+
+    async def _writeAndReadBack(self, block, words):
+        """Write a block and return what the device holds afterwards.
+
+        Writes are user actions and go ahead of queued polls.
+        """
+        if self.supports_fc23:
+            rr = await self._hub.execute(
+                "readwrite_registers", read_address=block.address, read_count=block.count,
+                write_address=block.address, values=words, slave=self.slave_id, priority=PRIORITY_INTERACTIVE)
+            if rr.isError():
+                raise io_error("Error writing {} registers at {}".format(block.count, block.address))
+            return rr.registers
+
+        if len(words) == 1:
+            rr = await self._hub.execute(
+                "write_register", block.address, words[0], slave=self.slave_id, priority=PRIORITY_INTERACTIVE)
+        else:
+            rr = await self._hub.execute(
+                "write_registers", block.address, words, slave=self.slave_id, priority=PRIORITY_INTERACTIVE)
+        if rr.isError():
+            raise io_error("Error writing {} registers at {}".format(block.count, block.address))
+        try:
+            return await self._readBlock(block, PRIORITY_INTERACTIVE)
+        except Exception as err:
+            _LOGGER.debug("Read-back at %s failed, keeping written value: %s", block.address, err)
+            return words
+
+    def _invalidate(self, block):
+        for register in self.image.invalidate(block.table, block.address, block.count):
+            key = (register.group, register.key)
+            self._changes.add(key)
+            self._updated.pop(key, None)
 
     def getModelName(self):
-        return self.Datapoints.get("Device_Info", {}).get("Model", _v("Unknown")).Value
+        return self._values["Device_Info"].get("Model", "Unknown")
 
     def getSerialNumber(self):
-        return self.Datapoints.get("Device_Info", {}).get("Serial", _v("0000")).Value
+        return self._values["Device_Info"].get("Serial", "0000")
 
     def getFW(self):
-        return self.Datapoints.get("Device_Info", {}).get("FW", _v("0.0.0")).Value
+        return self._values["Device_Info"].get("FW", "0.0.0")
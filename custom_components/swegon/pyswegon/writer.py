@@ -0,0 +1,103 @@
+# Debounced, coalesced holding register writes
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Quiet time after the last write before the queue is flushed
+DEFAULT_WRITE_DELAY = 0.3  # Seconds
+
+# A steady stream of writes is still flushed this long after the first one
+MAX_WRITE_DELAY = 2.0  # Seconds
+
+# Largest number of registers a single write request (FC16) may carry
+MAX_WRITE_COUNT = 123
+
+
+class WriteQueue:
+    """Collect writes and send them in as few requests as possible.
+
+    Writes to the same register only keep the last value, writes to
+    adjacent registers are merged into one write_registers (FC16) request.
+    Every write returns a future that resolves once its registers have
+    been committed to the device.
+    """
+
+    def __init__(self, write_block, delay=DEFAULT_WRITE_DELAY, max_delay=MAX_WRITE_DELAY):
+        # Coroutine function taking (address, words) that performs the write
+        self._write_block = write_block
+        self.delay = delay
+        self.max_delay = max_delay
+
+        self._pending = {}
+        self._waiters = []
+        self._timer = None
+        self._first_write = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def enqueue(self, address, words):
+        """Queue words starting at address, returns a future for the commit."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        for i, word in enumerate(words):
+            self._pending[address + i] = word
+        self._waiters.append((range(address, address + len(words)), future))
+
+        now = loop.time()
+        if self._first_write is None:
+            self._first_write = now
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = min(self.delay, max(0, self._first_write + self.max_delay - now))
+        self._timer = loop.call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+        return future
+
+    async def flush(self):
+        """Write everything queued so far."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._first_write = None
+
+        # One flush at a time, so writes reach the device in queue order
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, []
+            failed = {}
+            for address, words in self._runs(pending):
+                try:
+                    await self._write_block(address, words)
+                except Exception as err:
+                    _LOGGER.debug("Write of %s registers at %s failed: %s", len(words), address, err)
+                    for offset in range(len(words)):
+                        failed[address + offset] = err
+
+        for addresses, future in waiters:
+            if future.done():
+                continue
+            errors = [failed[address] for address in addresses if address in failed]
+            if errors:
+                future.set_exception(errors[0])
+            else:
+                future.set_result(None)
+
+    @staticmethod
+    def _runs(pending):
+        """Split pending writes into runs of adjacent registers."""
+        run_start = None
+        words = []
+        for address in sorted(pending):
+            if run_start is not None and address == run_start + len(words) and len(words) < MAX_WRITE_COUNT:
+                words.append(pending[address])
+                continue
+            if words:
+                yield run_start, words
+            run_start = address
+            words = [pending[address]]
+        if words:
+            yield run_start, words
@@ -1,27 +1,49 @@
 import logging
+import time
 
 from collections import namedtuple
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
 from homeassistant.const import CONF_DEVICES, PERCENTAGE, TEMPERATURE, CONCENTRATION_PARTS_PER_MILLION
-from homeassistant.const import UnitOfPressure, UnitOfTemperature, UnitOfVolumeFlowRate
+from homeassistant.const import UnitOfInformation, UnitOfPower, UnitOfPressure, UnitOfTemperature, UnitOfTime, UnitOfVolumeFlowRate
 from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import callback
 from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.event import async_call_later
 
 from .const import DOMAIN, CONF_IP
 from .entity import SwegonBaseEntity
 
 _LOGGER = logging.getLogger(__name__)
 
-DATA_TYPE = namedtuple('DataType', ['units', 'deviceClass', 'category', 'icon'])
+# Publish filtering, to keep sensor noise out of the state machine and recorder:
+# deadband: smaller changes are held back, until the heartbeat has passed
+# min_interval: seconds between two published changes
+# heartbeat: seconds after which a held back value is published anyway
+DEFAULT_HEARTBEAT = 900  # Seconds
+DIAGNOSTIC_MIN_INTERVAL = 300  # Seconds, counters change on every poll
+
+# Scaled values carry float error, 20.2 - 20.0 is just below 0.2
+DEADBAND_TOLERANCE = 1e-6
+
+DATA_TYPE = namedtuple(
+    'DataType',
+    ['units', 'deviceClass', 'category', 'icon', 'deadband', 'min_interval', 'heartbeat'],
+    defaults=[0, 0, DEFAULT_HEARTBEAT],
+)
 DATA_TYPES = {}
-DATA_TYPES["co2"] = DATA_TYPE(CONCENTRATION_PARTS_PER_MILLION, SensorDeviceClass.CO2, None, None)
-DATA_TYPES["flow"] = DATA_TYPE(UnitOfVolumeFlowRate.CUBIC_METERS_PER_HOUR, None, None, "mdi:weather-windy")
-DATA_TYPES["humidity"] = DATA_TYPE(PERCENTAGE, SensorDeviceClass.HUMIDITY, None, None)
-DATA_TYPES["humidity_abs"] = DATA_TYPE("g/m³", None, None, None)
-DATA_TYPES["percent"] = DATA_TYPE(PERCENTAGE, None, None, None)
-DATA_TYPES["pressure"] = DATA_TYPE(UnitOfPressure.PA, SensorDeviceClass.PRESSURE, None, None)
-DATA_TYPES["temperature"] = DATA_TYPE(UnitOfTemperature.CELSIUS, SensorDeviceClass.TEMPERATURE, None, None)
-DATA_TYPES["voc"] = DATA_TYPE(CONCENTRATION_PARTS_PER_MILLION, SensorDeviceClass.VOLATILE_ORGANIC_COMPOUNDS_PARTS, None, None)
+DATA_TYPES["co2"] = DATA_TYPE(CONCENTRATION_PARTS_PER_MILLION, SensorDeviceClass.CO2, None, None, 20, 60)
+DATA_TYPES["flow"] = DATA_TYPE(UnitOfVolumeFlowRate.CUBIC_METERS_PER_HOUR, None, None, "mdi:weather-windy", 5, 60)
+DATA_TYPES["humidity"] = DATA_TYPE(PERCENTAGE, SensorDeviceClass.HUMIDITY, None, None, 1, 60)
+DATA_TYPES["humidity_abs"] = DATA_TYPE("g/m³", None, None, None, 0.2, 60)
+DATA_TYPES["percent"] = DATA_TYPE(PERCENTAGE, None, None, None, 1, 30)
+DATA_TYPES["power"] = DATA_TYPE(UnitOfPower.WATT, SensorDeviceClass.POWER, None, "mdi:heat-wave", 20, 60)
+DATA_TYPES["pressure"] = DATA_TYPE(UnitOfPressure.PA, SensorDeviceClass.PRESSURE, None, None, 2, 60)
+DATA_TYPES["temperature"] = DATA_TYPE(UnitOfTemperature.CELSIUS, SensorDeviceClass.TEMPERATURE, None, None, 0.2, 60)
+DATA_TYPES["temperature_delta"] = DATA_TYPE(UnitOfTemperature.KELVIN, None, None, "mdi:thermometer-lines", 0.2, 60)
+DATA_TYPES["voc"] = DATA_TYPE(CONCENTRATION_PARTS_PER_MILLION, SensorDeviceClass.VOLATILE_ORGANIC_COMPOUNDS_PARTS, None, None, 20, 60)
+DATA_TYPES["diag_count"] = DATA_TYPE(None, None, EntityCategory.DIAGNOSTIC, "mdi:counter", 0, DIAGNOSTIC_MIN_INTERVAL)
+DATA_TYPES["diag_time"] = DATA_TYPE(UnitOfTime.MILLISECONDS, SensorDeviceClass.DURATION, EntityCategory.DIAGNOSTIC, "mdi:timer-outline", 0, DIAGNOSTIC_MIN_INTERVAL)
+DATA_TYPES["diag_bytes"] = DATA_TYPE(UnitOfInformation.BYTES, SensorDeviceClass.DATA_SIZE, EntityCategory.DIAGNOSTIC, "mdi:swap-vertical", 0, DIAGNOSTIC_MIN_INTERVAL)
 
 SwegonEntity = namedtuple('SwegonEntity', ['group', 'key', 'entityName', 'data_type'])
 ENTITIES = [
@@ -30,27 +52,39 @@ ENTITIES = [
     SwegonEntity("Sensors", "Supply_Temp2", "Supply Temp", DATA_TYPES["temperature"]),
     SwegonEntity("Sensors", "Extract_Temp", "Extract Temp", DATA_TYPES["temperature"]),
     SwegonEntity("Sensors", "Exhaust_Temp", "Exhaust Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "Room_Temp", "Room Air Temp", DATA_TYPES["temperature"]),
+    SwegonEntity("Sensors", "Room_Temp", "Room Air Temp", DATA_TYPES["temperature"]),
     SwegonEntity("Sensors", "UP1_Temp", "User Panel 1 Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "UP2_Temp", "User Panel 2 Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "WR_Temp", "Water Radiator Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "PreHeat_Temp", "Pre-Heater Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "ExtFresh_Temp", "External Fresh Air Temp", DATA_TYPES["temperature"]),
-    #SwegonEntity("Sensors", "C02_Unf", "CO2 Unfiltered", DATA_TYPES["co2"]),
-    #SwegonEntity("Sensors", "CO2_Fil", "CO2 Filtered", DATA_TYPES["co2"]),
+    SwegonEntity("Sensors", "UP2_Temp", "User Panel 2 Temp", DATA_TYPES["temperature"]),
+    SwegonEntity("Sensors", "WR_Temp", "Water Radiator Temp", DATA_TYPES["temperature"]),
+    SwegonEntity("Sensors", "PreHeat_Temp", "Pre-Heater Temp", DATA_TYPES["temperature"]),
+    SwegonEntity("Sensors", "ExtFresh_Temp", "External Fresh Air Temp", DATA_TYPES["temperature"]),
+    SwegonEntity("Sensors", "C02_Unf", "CO2 Unfiltered", DATA_TYPES["co2"]),
+    SwegonEntity("Sensors", "CO2_Fil", "CO2 Filtered", DATA_TYPES["co2"]),
     SwegonEntity("Sensors", "RH", "Relative Humidity", DATA_TYPES["humidity"]),
     SwegonEntity("Sensors", "AH", "Absolute Humidity", DATA_TYPES["humidity_abs"]),
-    #SwegonEntity("Sensors", "AH_SP", "Absolute Humidity SP", DATA_TYPES["humidity_abs"]),
-    #SwegonEntity("Sensors", "VOC", "VOC", DATA_TYPES["voc"]),
-    #SwegonEntity("Sensors", "Supply_Pressure", "Supply Pressure", DATA_TYPES["pressure"]),
-    #SwegonEntity("Sensors", "Exhaust_Pressure", "Exhaust Pressure", DATA_TYPES["pressure"]),
-    #SwegonEntity("Sensors", "Supply_Flow", "Supply Flow", DATA_TYPES["flow"]),
-    #SwegonEntity("Sensors", "Exhaust_Flow", "Exhaust Flow", DATA_TYPES["flow"]),
+    SwegonEntity("Sensors", "AH_SP", "Absolute Humidity SP", DATA_TYPES["humidity_abs"]),
+    SwegonEntity("Sensors", "VOC", "VOC", DATA_TYPES["voc"]),
+    SwegonEntity("Sensors", "Supply_Pressure", "Supply Pressure", DATA_TYPES["pressure"]),
+    SwegonEntity("Sensors", "Exhaust_Pressure", "Exhaust Pressure", DATA_TYPES["pressure"]),
+    SwegonEntity("Sensors", "Supply_Flow", "Supply Flow", DATA_TYPES["flow"]),
+    SwegonEntity("Sensors", "Exhaust_Flow", "Exhaust Flow", DATA_TYPES["flow"]),
     SwegonEntity("Sensors2", "Heat_Exchanger", "Heat Exchanger", DATA_TYPES["percent"]),
     SwegonEntity("UnitStatuses", "Supply_Fan", "Supply Fan", DATA_TYPES["percent"]),
     SwegonEntity("UnitStatuses", "Exhaust_Fan", "Exhaust Fan", DATA_TYPES["percent"]),
     SwegonEntity("UnitStatuses", "Heating_Output", "Heating Output", DATA_TYPES["percent"]),
     SwegonEntity("VirtualSensors", "Efficiency", "Efficiency", DATA_TYPES["percent"]),
+    SwegonEntity("VirtualSensors", "Supply_Temp_Rise", "Supply Temp Rise", DATA_TYPES["temperature_delta"]),
+    SwegonEntity("VirtualSensors", "Extract_Temp_Drop", "Extract Temp Drop", DATA_TYPES["temperature_delta"]),
+    SwegonEntity("VirtualSensors", "Recovered_Power", "Recovered Heat", DATA_TYPES["power"]),
+    SwegonEntity("Diagnostics", "Requests", "Modbus Requests", DATA_TYPES["diag_count"]),
+    SwegonEntity("Diagnostics", "Errors", "Modbus Exception Responses", DATA_TYPES["diag_count"]),
+    SwegonEntity("Diagnostics", "Timeouts", "Modbus Timeouts", DATA_TYPES["diag_count"]),
+    SwegonEntity("Diagnostics", "Reconnects", "Modbus Reconnects", DATA_TYPES["diag_count"]),
+    SwegonEntity("Diagnostics", "Latency_P50", "Modbus Latency p50", DATA_TYPES["diag_time"]),
+    SwegonEntity("Diagnostics", "Latency_P95", "Modbus Latency p95", DATA_TYPES["diag_time"]),
+    SwegonEntity("Diagnostics", "Queue_Wait", "Modbus Queue Wait", DATA_TYPES["diag_time"]),
+    SwegonEntity("Diagnostics", "Bytes_Out", "Modbus Bytes Sent", DATA_TYPES["diag_bytes"]),
+    SwegonEntity("Diagnostics", "Bytes_In", "Modbus Bytes Received", DATA_TYPES["diag_bytes"]),
 ]
 
 async def async_setup_entry(hass, config_entry, async_add_devices):
@@ -61,16 +95,20 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     # Find coordinator for this device
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
 
-    # Create entities for this device
+    # Create entities for this device, leaving out sensors it does not have
     for swegonentity in ENTITIES:
-        ha_entities.append(SwegonSensorEntity(coordinator, swegonentity))
+        if coordinator.supports(swegonentity.group, swegonentity.key):
+            ha_entities.append(SwegonSensorEntity(coordinator, swegonentity))
 
-    async_add_devices(ha_entities, True)
+    async_add_devices(ha_entities)
 
 
 class SwegonSensorEntity(SwegonBaseEntity, SensorEntity):
     """Representation of a Sensor."""
 
+    # Rolling statistics change with every poll, not worth keeping in the recorder
+    _unrecorded_attributes = SwegonBaseEntity._unrecorded_attributes | frozenset({"min", "max", "mean", "trend", "samples"})
+
     def __init__(self, coordinator, swegonentity):
         super().__init__(coordinator, swegonentity)
 
@@ -78,8 +116,78 @@ class SwegonSensorEntity(SwegonBaseEntity, SensorEntity):
         self._attr_device_class = swegonentity.data_type.deviceClass
         self._attr_native_unit_of_measurement = swegonentity.data_type.units
 
+        """Publish filtering"""
+        self._data_type = swegonentity.data_type
+        self._published_value = None
+        self._published_available = None
+        self._published_quality = None
+        self._published_at = None
+        self._cancel_publish = None
+
+    async def async_added_to_hass(self) -> None:
+        self._published_value = self.coordinator.get_value(self._group, self._key)
+        self._published_available = self.available
+        self._published_quality = self._quality()
+        self._published_at = time.monotonic()
+        self.async_on_remove(self._cancel_pending_publish)
+        await super().async_added_to_hass()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Publish the new value, unless the filter holds it back."""
+        self._async_filter_publish()
+
+    @callback
+    def _async_filter_publish(self, _now=None) -> None:
+        self._cancel_pending_publish()
+        value = self.coordinator.get_value(self._group, self._key)
+        delay = self._publish_delay(value, time.monotonic())
+        if delay is None:
+            return
+        if delay > 0:
+            self._cancel_publish = async_call_later(self.hass, delay, self._async_filter_publish)
+            return
+        self._published_value = value
+        self._published_available = self.available
+        self._published_quality = self._quality()
+        self._published_at = time.monotonic()
+        self.async_write_ha_state()
+
+    def _quality(self):
+        return self.coordinator.datapoint_attributes(self._group, self._key).get("quality")
+
+    def _publish_delay(self, value, now):
+        """Seconds until value may be published, None if there is nothing new."""
+        last = self._published_value
+        unchanged = self.available == self._published_available and self._quality() == self._published_quality
+        if (
+            self._published_at is None
+            or not unchanged
+            or not isinstance(value, (int, float))
+            or not isinstance(last, (int, float))
+        ):
+            return None if value == last and unchanged else 0
+        if value == last:
+            return None
+        elapsed = now - self._published_at
+        if abs(value - last) < self._data_type.deadband - DEADBAND_TOLERANCE:
+            return max(0, self._data_type.heartbeat - elapsed)
+        return max(0, self._data_type.min_interval - elapsed)
+
+    @callback
+    def _cancel_pending_publish(self) -> None:
+        if self._cancel_publish is not None:
+            self._cancel_publish()
+            self._cancel_publish = None
+
     @property
     def native_value(self):
-        """Return the value of the sensor."""
-        val = self.coordinator.get_value(self._group, self._key)
-        return val
+        """Return the last published value of the sensor."""
+        if self._published_at is None:
+            return self.coordinator.get_value(self._group, self._key)
+        return self._published_value
+
+    @property
+    def extra_state_attributes(self):
+        """Rolling statistics over the last STATISTICS_WINDOW seconds."""
+        return {**(self.coordinator.get_statistics(self._group, self._key) or {}), **super().extra_state_attributes}
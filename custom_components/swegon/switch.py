@@ -29,7 +29,7 @@ async def async_setup_entry(hass, config_entry, async_add_devices):
     for swegonentity in ENTITIES:
         ha_entities.append(SwegonSwitchEntity(coordinator, swegonentity))
 
-    async_add_devices(ha_entities, True)
+    async_add_devices(ha_entities)
 
 
 class SwegonSwitchEntity(SwegonBaseEntity, SwitchEntity):
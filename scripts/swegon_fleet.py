@@ -0,0 +1,18 @@
+"""Standalone fleet poller, see pyswegon/fleet.py.
+
+The integration package can't be run with python -m from inside it, its
+select.py shadows the standard library module of the same name. This
+script puts pyswegon on the path without that.
+
+    python scripts/swegon_fleet.py --config units.yaml --prometheus-port 9502
+"""
+import sys
+from pathlib import Path
+
+# pyswegon is importable on its own, without Home Assistant
+sys.path.append(str(Path(__file__).resolve().parent.parent / "custom_components" / "swegon"))
+
+from pyswegon.fleet import main  # noqa: E402
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Local CASA Modbus TCP simulator, see pyswegon/simulator.py.
+
+The integration package can't be run with python -m from inside it, its
+select.py shadows the standard library module of the same name. This
+script puts pyswegon on the path without that.
+
+    python scripts/swegon_simulator.py --port 5020 --latency 0.05 --jitter 0.02
+"""
+import sys
+from pathlib import Path
+
+# pyswegon is importable on its own, without Home Assistant
+sys.path.append(str(Path(__file__).resolve().parent.parent / "custom_components" / "swegon"))
+
+from pyswegon.simulator import main  # noqa: E402
+
+if __name__ == "__main__":
+    main()
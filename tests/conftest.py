@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# pyswegon is importable on its own, without Home Assistant. Appended, so the
+# integration's select.py doesn't shadow the standard library module.
+sys.path.append(str(Path(__file__).resolve().parent.parent / "custom_components" / "swegon"))
@@ -0,0 +1,41 @@
+import pytest
+
+from pyswegon.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=3, base_delay=10, jitter=0)
+    for _ in range(2):
+        breaker.record_failure(now=0)
+    assert breaker.state == CLOSED
+    breaker.record_failure(now=0)
+    assert breaker.state == OPEN
+    assert not breaker.available
+    with pytest.raises(CircuitOpenError):
+        breaker.check("unit", now=5)
+
+
+def test_half_open_probe_closes_or_reopens_with_longer_delay():
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=10, jitter=0)
+    breaker.record_failure(now=0)
+    assert breaker.retry_at == 10
+    assert breaker.allow(now=10)
+    assert breaker.state == HALF_OPEN
+    # Only one probe is let through
+    assert not breaker.allow(now=10)
+
+    breaker.record_failure(now=10)
+    assert breaker.state == OPEN
+    assert breaker.retry_at == 30
+
+    assert breaker.allow(now=30)
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_delay_is_capped():
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=10, max_delay=60, jitter=0)
+    for _ in range(10):
+        breaker.record_failure(now=0)
+    assert breaker.delay() == 60
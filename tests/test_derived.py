@@ -0,0 +1,18 @@
+from pyswegon.derived import EXTRACT, FRESH, SUPPLY, DerivedEngine
+
+
+def _update(engine, changed, values):
+    return {(group, key): value for group, key, value in engine.update(changed, lambda g, k: values.get((g, k)))}
+
+
+def test_only_dependents_of_changed_inputs_are_computed():
+    values = {SUPPLY: 18.0, FRESH: 0.0, EXTRACT: 20.0}
+    assert _update(DerivedEngine(), {EXTRACT}, values) == {
+        ("VirtualSensors", "Efficiency"): 90.0,
+        ("VirtualSensors", "Extract_Temp_Drop"): None,
+    }
+
+
+def test_missing_input_gives_none():
+    updated = _update(DerivedEngine(), {SUPPLY}, {SUPPLY: 18.0})
+    assert updated and set(updated.values()) == {None}
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pymodbus.client  # noqa: F401  Loaded up front, the connects time out quickly
+import pytest
+
+from pyswegon import hub as hub_module
+from pyswegon.breaker import OPEN
+from pyswegon.hub import ModbusHub
+from pyswegon.swegon import Swegon
+
+
+class SlowClient:
+    """Pipelined client stand-in whose connect never finishes in time."""
+
+    def __init__(self, host, port, on_mismatch=None):
+        self.connected = False
+
+    async def connect(self):
+        await asyncio.sleep(10)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    monkeypatch.setattr(hub_module, "PipelinedModbusTcpClient", SlowClient)
+
+
+def _open(breaker):
+    """Open the breaker with the backoff already passed, so the next
+    call is let through as the half open probe."""
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(now=-1000)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_connect_counts_as_failure(slow_client):
+    async def main():
+        hub = ModbusHub("gateway", 502, window=2)
+        _open(hub._backoff)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hub.connect(), 0.01)
+        assert hub._backoff.state == OPEN
+        assert hub._backoff.retry_at > time.monotonic()
+        assert hub.metrics.connect_failures == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_poll_reopens_the_unit_breaker(slow_client):
+    async def main():
+        device = Swegon("CASA R4", "gateway", 502, pipeline_window=2)
+        try:
+            _open(device._breaker)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(device.pollRegisters(list(device.Registers.values()), 1), 0.01)
+            assert device._breaker.state == OPEN
+        finally:
+            await device.close()
+
+    asyncio.run(main())
+
+
+def test_pipelining_falls_back_on_mismatches_only_and_comes_back():
+    hub = ModbusHub.acquire("gateway", 502, window=4)
+    for _ in range(10):
+        hub.record_poll()
+    assert hub.window == 4
+
+    # Mismatches in some polls, but not in a row
+    for mismatched in (True, True, False) * 3:
+        hub.mismatches += mismatched
+        hub.record_poll()
+    assert hub.window == 4
+
+    for _ in range(hub_module.PIPELINE_FALLBACK_POLLS):
+        hub.mismatches += 1
+        hub.record_poll()
+    assert hub.window == 1
+    # Another unit on the gateway doesn't turn it back on
+    assert ModbusHub.acquire("gateway", 502, window=4) is hub
+    assert hub.window == 1
+
+    for _ in range(hub_module.PIPELINE_RESTORE_POLLS - 1):
+        hub.record_poll()
+    assert hub.window == 1
+    hub.record_poll()
+    assert hub.window == 4
+    asyncio.run(hub.release())
+    asyncio.run(hub.release())
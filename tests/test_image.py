@@ -0,0 +1,91 @@
+import pytest
+
+from pyswegon.image import RegisterImage, TableDecoder, decode, encode
+from pyswegon.registers import INPUT, PROFILES, SENSOR_MISSING, Register
+
+
+def _words(value):
+    return [(value >> 16) & 0xFFFF, value & 0xFFFF]
+
+
+@pytest.mark.parametrize("data_type, raw, expected", [
+    ("uint16", [0xFFFF], 0xFFFF),
+    ("int16", [0xFFFF], -1),
+    ("int16", [0x7FFF], 0x7FFF),
+    ("uint32", _words(0xFFFFFFFE), 0xFFFFFFFE),
+    ("int32", _words(0xFFFFFFFE), -2),
+    ("int32", _words(70000), 70000),
+])
+def test_decode_types(data_type, raw, expected):
+    assert decode(Register("G", "K", INPUT, 0, data_type), raw) == expected
+
+
+def test_decode_scale_offset_and_sentinel():
+    register = Register("G", "K", INPUT, 0, "int16", 0.1, offset=-5, sentinel=SENSOR_MISSING)
+    assert decode(register, [215]) == 16.5
+    assert decode(register, [SENSOR_MISSING & 0xFFFF]) is None
+
+
+def test_table_decoder_matches_decode():
+    registers = [
+        Register("G", "A", INPUT, 10, "int16", 0.1, sentinel=SENSOR_MISSING),
+        Register("G", "B", INPUT, 11, "uint32"),
+        Register("G", "C", INPUT, 15, "int32"),
+        Register("G", "D", INPUT, 17, "uint16"),
+    ]
+    raw = [0] * 8
+    raw[0] = SENSOR_MISSING & 0xFFFF
+    raw[1:3] = _words(0x12345678)
+    raw[5:7] = _words(0xFFFFFF00)
+    raw[7] = 42
+    image = RegisterImage(registers)
+    image.store(INPUT, 10, raw)
+    decoder = TableDecoder(10, 8, registers)
+    decoded = decoder.decode(bytes(image._raw[INPUT]))
+    for register in registers:
+        offset = register.address - 10
+        expected = decode(register, raw[offset:offset + 2])
+        assert decoded[offset] == expected
+        assert image.get(register) == expected
+    assert decoded[0] is None
+    assert decoded[5] == -256
+
+
+def test_image_reports_changes_and_restores():
+    registers = PROFILES["CASA R4"].registers
+    image = RegisterImage(registers)
+    fresh = next(r for r in registers if r.key == "Fresh_Temp")
+    refreshed, changed = image.store(INPUT, fresh.address, [215])
+    assert fresh in refreshed and fresh in changed
+    _, changed = image.store(INPUT, fresh.address, [215])
+    assert changed == []
+    assert image.get(fresh) == 21.5
+
+    copy = RegisterImage(registers)
+    assert fresh in copy.restore(image.snapshot())
+    assert copy.get(fresh) == 21.5
+
+
+@pytest.mark.parametrize("data_type, scale, value", [
+    ("int16", 0.1, -12.5),
+    ("uint16", 1, 65535),
+    ("int32", 1, -70000),
+    ("uint32", 0.01, 42949672.95),
+])
+def test_encode_round_trips(data_type, scale, value):
+    register = Register("G", "K", INPUT, 0, data_type, scale)
+    words = encode(register, value)
+    assert len(words) == (2 if data_type.endswith("32") else 1)
+    assert all(0 <= word <= 0xFFFF for word in words)
+    assert decode(register, words) == value
+
+
+def test_encode_puts_the_high_word_first():
+    assert encode(Register("G", "K", INPUT, 0, "uint32"), 0x12345678) == [0x1234, 0x5678]
+    assert encode(Register("G", "K", INPUT, 0, "int32"), -2) == [0xFFFF, 0xFFFE]
+
+
+@pytest.mark.parametrize("data_type, value", [("uint16", 65536), ("uint16", -1), ("int16", 32768), ("uint32", 1 << 32)])
+def test_encode_rejects_values_out_of_range(data_type, value):
+    with pytest.raises(ValueError):
+        encode(Register("G", "K", INPUT, 0, data_type), value)
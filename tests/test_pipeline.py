@@ -0,0 +1,73 @@
+import asyncio
+import struct
+
+from pyswegon.pipeline import PipelinedModbusTcpClient
+
+
+def test_parse_registers():
+    response = PipelinedModbusTcpClient._parse(3, bytes([3, 4, 0x12, 0x34, 0xFF, 0xFF]))
+    assert not response.isError()
+    assert response.registers == [0x1234, 0xFFFF]
+
+
+def test_parse_exception_response():
+    response = PipelinedModbusTcpClient._parse(4, bytes([0x84, 0x02]))
+    assert response.isError()
+    assert response.exception_code == 2
+
+
+def test_parse_write_response():
+    response = PipelinedModbusTcpClient._parse(16, bytes([16, 0, 100, 0, 2]))
+    assert not response.isError()
+    assert response.registers == []
+
+
+def test_duplicate_responses_are_reported_as_mismatches():
+    async def handle(reader, writer):
+        # Answers every request twice, like a gateway mixing up transactions
+        while True:
+            try:
+                header = await reader.readexactly(7)
+            except asyncio.IncompleteReadError:
+                break
+            await reader.readexactly(struct.unpack(">H", header[4:6])[0] - 1)
+            frame = header[:4] + struct.pack(">HB", 5, header[6]) + bytes([4, 2, 0, 42])
+            writer.write(frame + frame)
+
+    async def main():
+        mismatches = []
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = PipelinedModbusTcpClient("127.0.0.1", port, on_mismatch=lambda: mismatches.append(1))
+        await client.connect()
+        responses = await asyncio.gather(*(client.read_input_registers(i) for i in range(3)))
+        await asyncio.sleep(0.05)
+        client.close()
+        server.close()
+        return responses, len(mismatches)
+
+    responses, mismatches = asyncio.run(main())
+    assert [r.registers for r in responses] == [[42]] * 3
+    assert mismatches == 3
+
+
+def test_exception_responses_are_not_mismatches():
+    async def handle(reader, writer):
+        header = await reader.readexactly(7)
+        pdu = await reader.readexactly(struct.unpack(">H", header[4:6])[0] - 1)
+        writer.write(header[:4] + struct.pack(">HB", 3, header[6]) + bytes([pdu[0] | 0x80, 6]))
+
+    async def main():
+        mismatches = []
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        client = PipelinedModbusTcpClient(
+            "127.0.0.1", server.sockets[0].getsockname()[1], on_mismatch=lambda: mismatches.append(1))
+        await client.connect()
+        response = await client.read_holding_registers(0)
+        client.close()
+        server.close()
+        return response, mismatches
+
+    response, mismatches = asyncio.run(main())
+    assert response.exception_code == 6
+    assert mismatches == []
@@ -0,0 +1,49 @@
+from pyswegon.registers import HOLDING, INPUT, MAX_READ_COUNT, Register, plan_reads, register_width
+
+
+def _reg(address, table=INPUT, data_type="uint16", key=None):
+    return Register("Test", key or "R{}".format(address), table, address, data_type)
+
+
+def test_register_width():
+    assert register_width(_reg(0)) == 1
+    assert register_width(_reg(0, data_type="int16")) == 1
+    assert register_width(_reg(0, data_type="int32")) == 2
+    assert register_width(_reg(0, data_type="uint32")) == 2
+
+
+def test_adjacent_registers_share_a_block():
+    blocks = plan_reads([_reg(2), _reg(0), _reg(1)])
+    assert [(b.table, b.address, b.count) for b in blocks] == [(INPUT, 0, 3)]
+    assert [r.address for r in blocks[0].registers] == [0, 1, 2]
+
+
+def test_gaps_up_to_max_gap_are_bridged():
+    assert len(plan_reads([_reg(0), _reg(5)], max_gap=4)) == 1
+    assert len(plan_reads([_reg(0), _reg(6)], max_gap=4)) == 2
+
+
+def test_tables_are_never_merged():
+    blocks = plan_reads([_reg(0, INPUT), _reg(1, HOLDING)])
+    assert sorted((b.table, b.address) for b in blocks) == [(HOLDING, 1), (INPUT, 0)]
+
+
+def test_blocks_stay_within_the_read_limit():
+    registers = [_reg(address) for address in range(300)]
+    blocks = plan_reads(registers)
+    assert all(b.count <= MAX_READ_COUNT for b in blocks)
+    assert [b.count for b in blocks] == [125, 125, 50]
+    assert sum(len(b.registers) for b in blocks) == 300
+
+
+def test_32_bit_register_is_not_split():
+    registers = [_reg(address) for address in range(124)] + [_reg(124, data_type="uint32")]
+    blocks = plan_reads(registers)
+    assert [(b.address, b.count) for b in blocks] == [(0, 124), (124, 2)]
+
+
+def test_holes_are_never_bridged():
+    registers = [_reg(0), _reg(4)]
+    assert len(plan_reads(registers, holes={(INPUT, 2)})) == 2
+    # A hole in the other table doesn't matter
+    assert len(plan_reads(registers, holes={(HOLDING, 2)})) == 1
@@ -0,0 +1,75 @@
+import asyncio
+
+from pyswegon.registers import CASA_REGISTERS, INPUT
+from pyswegon.snapshot import default_ranges, scan_range
+
+
+class FakeDevice:
+    """Answers every address except the ones in missing, counts requests."""
+
+    def __init__(self, missing=(), answered=None):
+        self.missing = set(missing)
+        self.answered = answered
+        self.requests = 0
+
+    async def readRaw(self, table, address, count, priority=None):
+        self.requests += 1
+        addresses = range(address, address + count)
+        if any(a in self.missing for a in addresses) or (
+            self.answered is not None and not all(a in self.answered for a in addresses)
+        ):
+            return None
+        return list(range(address, address + count))
+
+
+def _scan(device, start, end, known=()):
+    return asyncio.run(scan_range(device, INPUT, start, end, known=known))
+
+
+def test_fully_readable_range_costs_one_request_per_chunk():
+    device = FakeDevice(())
+    readable, invalid = _scan(device, 0, 250)
+    assert readable == {0: list(range(250))}
+    assert invalid == []
+    assert device.requests == 2
+
+
+def test_unreadable_addresses_are_found():
+    missing = {10, 11, 12, 200}
+    device = FakeDevice(missing)
+    readable, invalid = _scan(device, 0, 250)
+    assert invalid == [(10, 13), (200, 201)]
+    words = {address + i for address, block in readable.items() for i in range(len(block))}
+    assert words == set(range(250)) - missing
+
+
+def test_unreadable_runs_are_skipped_in_few_requests():
+    device = FakeDevice(answered=set(range(4)) | set(range(100, 125)))
+    readable, invalid = _scan(device, 0, 125)
+    assert readable == {0: [0, 1, 2, 3], 100: list(range(100, 125))}
+    assert invalid == [(4, 100)]
+    assert device.requests <= 25
+
+
+def test_known_addresses_are_never_skipped():
+    # 10 lies between the single register probes at 5 and 12
+    device = FakeDevice(answered={0, 10})
+    readable, invalid = _scan(device, 0, 100, known=[10])
+    assert readable == {0: [0], 10: [10]}
+    assert invalid == [(1, 10), (11, 100)]
+
+
+def test_sparse_register_map_request_count():
+    """Scanning the default ranges of a unit answering only the CASA map."""
+    tables = {register.table for register in CASA_REGISTERS}
+    requests = 0
+    for table in tables:
+        answered = {r.address for r in CASA_REGISTERS if r.table == table}
+        device = FakeDevice(answered=answered)
+        start, end = default_ranges(CASA_REGISTERS)[table]
+        readable, _invalid = asyncio.run(scan_range(device, table, start, end, known=answered))
+        words = {address + i for address, block in readable.items() for i in range(len(block))}
+        assert words == answered
+        requests += device.requests
+    # Stepping over unreadable addresses one by one took 776 requests
+    assert requests <= 220
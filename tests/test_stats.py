@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from pyswegon.stats import RollingStats
+
+
+def test_matches_brute_force_over_the_window():
+    stats = RollingStats(window=100, capacity=30)
+    samples = []
+    random.seed(1)
+    for t in range(0, 2000, 5):
+        value = random.uniform(-10, 30)
+        stats.add(t, value)
+        samples.append((t, value))
+        window = [(ts, v) for ts, v in samples if ts >= t - 100][-30:]
+        values = [v for _, v in window]
+        assert stats.min == min(values)
+        assert stats.max == max(values)
+        assert stats.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_trend_per_hour():
+    stats = RollingStats(window=3600, capacity=100)
+    assert stats.trend is None
+    for t in range(0, 600, 60):
+        stats.add(t, 20 + t / 3600)
+    assert stats.trend == pytest.approx(1.0)
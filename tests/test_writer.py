@@ -0,0 +1,48 @@
+import asyncio
+
+from pyswegon.writer import MAX_WRITE_COUNT, WriteQueue
+
+
+def test_runs_merge_adjacent_registers():
+    pending = {5: 1, 6: 2, 7: 3, 10: 4}
+    assert list(WriteQueue._runs(pending)) == [(5, [1, 2, 3]), (10, [4])]
+
+
+def test_runs_respect_the_write_limit():
+    pending = dict.fromkeys(range(MAX_WRITE_COUNT + 5), 0)
+    assert [len(words) for _, words in WriteQueue._runs(pending)] == [MAX_WRITE_COUNT, 5]
+
+
+def test_writes_are_debounced_and_coalesced():
+    writes = []
+
+    async def write_block(address, words):
+        writes.append((address, list(words)))
+
+    async def main():
+        queue = WriteQueue(write_block, delay=0.01)
+        futures = [queue.enqueue(100, [1]), queue.enqueue(101, [2]), queue.enqueue(100, [3])]
+        await asyncio.gather(*futures)
+        assert queue.pending == 0
+
+    asyncio.run(main())
+    # The last write to a register wins, neighbours share one request
+    assert writes == [(100, [3, 2])]
+
+
+def test_failed_write_fails_its_futures_only():
+    async def write_block(address, words):
+        if address == 200:
+            raise IOError("busy")
+
+    async def main():
+        queue = WriteQueue(write_block, delay=0.01)
+        ok, failed = queue.enqueue(100, [1]), queue.enqueue(200, [1])
+        await ok
+        try:
+            await failed
+        except IOError:
+            return True
+        return False
+
+    assert asyncio.run(main())